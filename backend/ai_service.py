@@ -1,24 +1,106 @@
 import os
 import json
-from openai import AsyncOpenAI
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator
 from dotenv import load_dotenv
 
+from cache import build_cache, make_key
+from openai_client import call_with_retry, create_client
+from singleflight import SingleFlight
+from rate_limit import llm_limiter
+from metrics import FALLBACKS, record_usage, registry, stage
+from catalog_chunker import MAX_CHUNKS, merge_catalogs, split_into_chunks
+from briefing_analyzer import CONTEXT_FIELDS, split_dirty_fields
+from schemas import BriefingProcessado, CatalogoEstruturado, PatchSecoes
+from structured_output import parse_model_reply, response_format_for
+from prompt_sections import apply_patch, outline, parse_sections, select_sections
+from token_budget import count_tokens, plan
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
 load_dotenv()
 
 # Cliente ASYNC inicializado de forma lazy
 _client = None
 
 
-def get_client() -> AsyncOpenAI:
+def get_client() -> "AsyncOpenAI":
     global _client
     if _client is None:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY não configurada no arquivo .env")
-        _client = AsyncOpenAI(api_key=api_key, timeout=30.0)
+        _client = create_client(api_key)
     return _client
 
 
+def warm_client() -> bool:
+    """Cria o cliente no startup (import do SDK + pool HTTP) se a chave estiver configurada."""
+    if not os.getenv("OPENAI_API_KEY"):
+        return False
+    get_client()
+    return True
+
+
+async def close_client() -> None:
+    """Fecha o pool de conexões HTTP (chamado no shutdown da aplicação)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+# Chamadas idênticas (mesmo modelo, prompt de sistema e conteúdo) em andamento são compartilhadas
+inflight = SingleFlight()
+
+
+async def _create_completion(operacao: str, **kwargs):
+    """
+    chat.completions.create com retry/backoff e circuit breaker, dentro do limite
+    global de chamadas simultâneas (streams ocupam a vaga em refine_prompt_stream).
+    Chamadas sem streaming idênticas e simultâneas viram uma única requisição.
+    `operacao` identifica a chamada nas métricas (duração e tokens); em streams,
+    o uso vem no último chunk e é contabilizado por quem consome o stream.
+    """
+    client = get_client()
+    if kwargs.get("stream"):
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        return await call_with_retry(client.chat.completions.create, **kwargs)
+
+    async def chamar():
+        async with llm_limiter.slot():
+            with stage(f"llm_{operacao}"):
+                response = await call_with_retry(client.chat.completions.create, **kwargs)
+        record_usage(operacao, response)
+        return response
+
+    return await inflight.do(make_key(kwargs), chamar)
+
+
+def _structured(model, campos=None) -> dict:
+    """Parâmetro response_format (json_schema strict) para a chamada, se habilitado."""
+    response_format = response_format_for(model, campos)
+    return {"response_format": response_format} if response_format else {}
+
+
+def _reply_text(response) -> str:
+    return response.choices[0].message.content or ""
+
+
+def _ai_metrics() -> dict[tuple, float]:
+    stats = briefing_cache.stats()
+    return {
+        (("cache", "briefing"), ("result", "hit")): stats["hits"],
+        (("cache", "briefing"), ("result", "miss")): stats["misses"],
+        (("cache", "singleflight"), ("result", "hit")): inflight.shared,
+        (("cache", "singleflight"), ("result", "miss")): inflight.calls,
+    }
+
+
+registry.callback("cache_requests_total", "Consultas aos caches de IA por resultado", "counter", _ai_metrics)
+
+
 # ============================================================
 # PRÉ-PROCESSAMENTO DO BRIEFING (Anti-Papagaio)
 # ============================================================
@@ -58,13 +140,36 @@ Sua tarefa é INTERPRETAR e TRANSFORMAR um briefing bruto em dados limpos e prof
 
 Retorne APENAS um JSON válido com os campos processados. Mantenha campos que já estão bons."""
 
+# Cache dos campos processados: briefings idênticos não voltam para a IA
+briefing_cache = build_cache("BRIEFING_CACHE")
+
+# Pré-análise local dos campos (BRIEFING_FAST_PATH=0 envia sempre todos para a IA)
+BRIEFING_FAST_PATH = os.getenv("BRIEFING_FAST_PATH", "1").lower() not in ("0", "false", "no", "off")
+PREPROCESS_FIELDS = registry.counter("preprocess_fields_total", "Campos do briefing resolvidos localmente ou pela IA")
+
+
+# Único campo que a IA pode apagar de propósito (opção principal no transbordo imediato)
+CLEARABLE_FIELDS = frozenset({"opcoes_transbordo_imediato"})
+
+
+def _processed_fields(resposta: dict, enviados: dict) -> dict:
+    """
+    Só os campos enviados, sem null: no modo strict todo campo é obrigatório e a
+    IA devolve null no que não mexeu, o que apagaria o valor do usuário na mescla.
+    """
+    return {
+        campo: valor for campo, valor in resposta.items()
+        if campo in enviados and (valor is not None or campo in CLEARABLE_FIELDS)
+    }
+
 
 async def preprocess_briefing(dados: dict) -> dict:
     """
     Usa IA para interpretar e limpar os dados do briefing antes de gerar o prompt.
+    Campos já limpos (padrões, vazios, horários formatados...) não são enviados;
+    se nenhum campo precisar de interpretação, a chamada é evitada.
+    Resultados são cacheados pelo hash dos campos, modelo e prompt do sistema.
     """
-    client = get_client()
-
     # Campos que precisam de interpretação inteligente
     campos_para_processar = {
         "mensagem_boas_vindas": dados.get("mensagem_boas_vindas", ""),
@@ -82,35 +187,53 @@ async def preprocess_briefing(dados: dict) -> dict:
         "opcoes_transbordo_imediato": dados.get("opcoes_transbordo_imediato", ""),
     }
 
-    response = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": PREPROCESSOR_PROMPT},
-            {
-                "role": "user",
-                "content": f"""Processe este briefing e retorne JSON limpo:
+    # Fast path: só vão para a IA os campos que as regras locais não conseguem validar
+    if BRIEFING_FAST_PATH:
+        sujos, limpos = split_dirty_fields(campos_para_processar, dados)
+        PREPROCESS_FIELDS.inc(len(sujos), result="ia")
+        PREPROCESS_FIELDS.inc(len(limpos), result="local")
+        if not sujos:
+            return dados
+        contexto = {campo: campos_para_processar[campo] for campo in CONTEXT_FIELDS}
+        campos_para_processar = {**contexto, **sujos}
+
+    campos_json = json.dumps(campos_para_processar, ensure_ascii=False, indent=2)
+    messages = [
+        {"role": "system", "content": PREPROCESSOR_PROMPT},
+        {
+            "role": "user",
+            "content": f"""Processe este briefing e retorne JSON limpo:
 
 ```json
-{json.dumps(campos_para_processar, ensure_ascii=False, indent=2)}
+{campos_json}
 ```
 
 Retorne APENAS o JSON processado, sem explicações."""
-            }
-        ],
+        }
+    ]
+    # Campos vagos viram texto profissional: a saída pode passar do dobro da entrada
+    plano = plan("preprocess", messages, expected_output=count_tokens(campos_json) * 2 + 500)
+
+    cache_key = make_key(plano.model, PREPROCESSOR_PROMPT, campos_para_processar)
+    campos_processados = briefing_cache.get(cache_key)
+    if campos_processados is not None:
+        dados_finais = dados.copy()
+        dados_finais.update(_processed_fields(campos_processados, campos_para_processar))
+        return dados_finais
+
+    response = await _create_completion(
+        "preprocess",
+        messages=messages,
         temperature=0.3,
-        max_tokens=2000,
+        **plano.params(),
+        **_structured(BriefingProcessado, campos_para_processar),
     )
 
     try:
-        # Extrair JSON da resposta
-        resposta = response.choices[0].message.content.strip()
-        # Remover markdown se presente
-        if resposta.startswith("```"):
-            resposta = resposta.split("```")[1]
-            if resposta.startswith("json"):
-                resposta = resposta[4:]
-
-        campos_processados = json.loads(resposta)
+        # Valida campo a campo; só aceita de volta os campos que foram enviados
+        resposta = parse_model_reply(_reply_text(response), BriefingProcessado)
+        campos_processados = _processed_fields(resposta, campos_para_processar)
+        briefing_cache.set(cache_key, campos_processados)
 
         # Mesclar campos processados com dados originais
         dados_finais = dados.copy()
@@ -118,8 +241,9 @@ Retorne APENAS o JSON processado, sem explicações."""
 
         return dados_finais
 
-    except (json.JSONDecodeError, IndexError):
+    except (ValueError, IndexError):
         # Se falhar, retorna dados originais
+        FALLBACKS.inc(stage="preprocess_parse")
         return dados
 
 
@@ -153,27 +277,63 @@ Geração de Energia, Demolição, Jardinagem, Pintura, Limpeza, etc.
 - Se o texto não parecer um catálogo de equipamentos, retorne categorias vazias."""
 
 
-async def structure_catalog_from_text(raw_text: str) -> dict:
-    """Usa IA para estruturar texto bruto de PDF em categorias de equipamentos."""
-    client = get_client()
+CATALOG_CHUNK_CONCURRENCY = int(os.getenv("CATALOG_CHUNK_CONCURRENCY", "5"))
+CATALOG_CHUNKS_DROPPED = registry.counter("catalog_chunks_dropped_total", "Chunks de PDF descartados por passar de CATALOG_MAX_CHUNKS")
+
 
-    response = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": CATALOG_STRUCTURER_PROMPT},
-            {"role": "user", "content": f"Texto extraído do PDF:\n\n{raw_text[:4000]}"}
-        ],
+async def _structure_catalog_chunk(texto: str, parte: int, total: int) -> dict:
+    cabecalho = f"Texto extraído do PDF (parte {parte} de {total}):" if total > 1 else "Texto extraído do PDF:"
+    messages = [
+        {"role": "system", "content": CATALOG_STRUCTURER_PROMPT},
+        {"role": "user", "content": f"{cabecalho}\n\n{texto}"}
+    ]
+    # Os nomes dos itens voltam agrupados em JSON: saída da ordem do texto do chunk
+    plano = plan("structure", messages, expected_output=count_tokens(texto) + 500)
+    response = await _create_completion(
+        "structure",
+        messages=messages,
         temperature=0.2,
-        max_tokens=2000,
+        **plano.params(),
+        **_structured(CatalogoEstruturado),
+    )
+
+    return parse_model_reply(_reply_text(response), CatalogoEstruturado)
+
+
+async def structure_catalog_from_text(raw_text: str) -> dict:
+    """
+    Usa IA para estruturar texto bruto de PDF em categorias de equipamentos.
+    O texto é dividido em chunks (por página/linha) estruturados em paralelo,
+    e os resultados são mesclados sem duplicatas. Só os primeiros MAX_CHUNKS
+    são estruturados; "truncado" indica que o final do texto ficou de fora.
+    """
+    chunks = split_into_chunks(raw_text)
+    truncado = len(chunks) > MAX_CHUNKS
+    if truncado:
+        CATALOG_CHUNKS_DROPPED.inc(len(chunks) - MAX_CHUNKS)
+        chunks = chunks[:MAX_CHUNKS]
+    if not chunks:
+        return {"categorias": [], "truncado": False}
+
+    semaphore = asyncio.Semaphore(CATALOG_CHUNK_CONCURRENCY)
+
+    async def processar(i: int, chunk: str) -> dict:
+        async with semaphore:
+            return await _structure_catalog_chunk(chunk, i + 1, len(chunks))
+
+    resultados = await asyncio.gather(
+        *(processar(i, chunk) for i, chunk in enumerate(chunks)),
+        return_exceptions=True,
     )
 
-    resposta = response.choices[0].message.content.strip()
-    if resposta.startswith("```"):
-        resposta = resposta.split("```")[1]
-        if resposta.startswith("json"):
-            resposta = resposta[4:]
+    parciais = [r for r in resultados if isinstance(r, dict)]
+    if len(parciais) < len(resultados):
+        FALLBACKS.inc(len(resultados) - len(parciais), stage="structure_chunk")
+    if not parciais:
+        # Nenhum chunk deu certo: propaga o primeiro erro
+        raise next(r for r in resultados if isinstance(r, BaseException))
 
-    return json.loads(resposta)
+    return {**merge_catalogs(parciais), "truncado": truncado}
 
 
 # ============================================================
@@ -195,19 +355,12 @@ REGRAS IMPORTANTES:
 Retorne apenas o prompt refinado, nada mais."""
 
 
-async def refine_prompt(prompt_atual: str, instrucao: str) -> str:
-    """
-    Refina um prompt existente usando GPT-4 baseado na instrução do usuário.
-    """
-    client = get_client()
-
-    response = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {
-                "role": "user",
-                "content": f"""PROMPT ATUAL:
+def _refine_messages(prompt_atual: str, instrucao: str) -> list[dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"""PROMPT ATUAL:
 {prompt_atual}
 
 ---
@@ -218,10 +371,148 @@ INSTRUÇÃO DO USUÁRIO:
 ---
 
 Retorne o prompt modificado:""",
-            },
-        ],
+        },
+    ]
+
+
+def _refine_plan(messages: list[dict], prompt_atual: str):
+    # O prompt volta inteiro: a saída precisa caber ao menos o prompt atual, com folga para crescer
+    tokens_prompt = count_tokens(prompt_atual)
+    return plan("refine", messages, expected_output=tokens_prompt * 5 // 4 + 500, min_output=tokens_prompt)
+
+
+async def refine_prompt(prompt_atual: str, instrucao: str) -> str:
+    """
+    Refina um prompt existente usando GPT-4 baseado na instrução do usuário.
+    Prompts que não caberiam na saída do modelo são recusados (ContextOverflowError).
+    """
+    messages = _refine_messages(prompt_atual, instrucao)
+    response = await _create_completion(
+        "refine",
+        messages=messages,
         temperature=0.3,
-        max_tokens=4000,
+        **_refine_plan(messages, prompt_atual).params(),
     )
 
     return response.choices[0].message.content.strip()
+
+
+async def refine_prompt_stream(prompt_atual: str, instrucao: str) -> AsyncIterator[str]:
+    """
+    Versão em streaming de refine_prompt: produz os trechos de texto
+    conforme chegam da API.
+    """
+    messages = _refine_messages(prompt_atual, instrucao)
+    plano = _refine_plan(messages, prompt_atual)
+
+    # A vaga da OpenAI fica ocupada até o fim do stream
+    async with llm_limiter.slot():
+        stream = await _create_completion(
+            "refine",
+            messages=messages,
+            temperature=0.3,
+            stream=True,
+            **plano.params(),
+        )
+
+        # Com include_usage, o último chunk traz só o usage (choices vazio)
+        final = None
+        try:
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    final = chunk
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            record_usage("refine", final)
+
+
+# ============================================================
+# REFINAMENTO INCREMENTAL POR SEÇÃO
+# ============================================================
+
+SECTION_REFINE_PROMPT = """Você é um especialista em refinar prompts de assistentes de IA de atendimento no WhatsApp.
+
+Você recebe o ÍNDICE de seções de um prompt, o texto de algumas seções e uma instrução do usuário.
+Altere SOMENTE o necessário para cumprir a instrução.
+
+Retorne APENAS um JSON válido no formato:
+{
+  "secoes": [{"numero": 7, "conteudo": "## 7) Título\\n...texto completo da seção alterada..."}],
+  "novas_secoes": [{"apos": 7, "conteudo": "## 8) Título\\n...texto da nova seção..."}],
+  "precisa_prompt_completo": false
+}
+
+REGRAS:
+1. Em "secoes", inclua apenas seções que você realmente alterou, com o texto COMPLETO da seção (cabeçalho incluso)
+2. Só altere seções cujo texto foi enviado
+3. Use "novas_secoes" apenas se a instrução pedir uma seção nova (as seções seguintes são renumeradas automaticamente)
+4. Preserve variáveis Jinja2 ({{ variavel }}), o tom e o formato Markdown
+5. Se para cumprir a instrução for preciso ver ou alterar seções que não foram enviadas, retorne {"precisa_prompt_completo": true}"""
+
+
+async def _request_section_patch(prompt_atual: str, secoes: list, instrucao: str) -> dict:
+    _, todas = parse_sections(prompt_atual)
+    texto_secoes = "".join(s.texto for s in secoes)
+    messages = [
+        {"role": "system", "content": SECTION_REFINE_PROMPT},
+        {
+            "role": "user",
+            "content": f"""ÍNDICE DO PROMPT:
+{outline(todas)}
+
+---
+
+SEÇÕES PARA EDIÇÃO:
+{texto_secoes}
+
+---
+
+INSTRUÇÃO DO USUÁRIO:
+{instrucao}""",
+        },
+    ]
+    # Saída proporcional ao tamanho do trecho editado (com folga para a alteração)
+    plano = plan("refine_sections", messages, expected_output=count_tokens(texto_secoes) * 2 + 500)
+    response = await _create_completion(
+        "refine_sections",
+        messages=messages,
+        temperature=0.3,
+        **plano.params(),
+        **_structured(PatchSecoes),
+    )
+    return parse_model_reply(_reply_text(response), PatchSecoes)
+
+
+async def refine_prompt_sections(prompt_atual: str, instrucao: str) -> tuple[str, list[int]]:
+    """
+    Refina apenas as seções afetadas pela instrução e as recoloca no prompt,
+    garantindo que o restante fique idêntico. Se a instrução não indicar as
+    seções, envia o prompt inteiro mas recebe só o patch. Em último caso
+    (sem seções numeradas ou patch inválido), usa o refinamento completo.
+
+    Retorna o prompt refinado e os números das seções alteradas
+    (lista vazia quando caiu no refinamento completo).
+    """
+    _, secoes = parse_sections(prompt_atual)
+    if not secoes or len({s.numero for s in secoes}) < len(secoes):
+        # Sem seções, ou com números repetidos (patch ambíguo): refinamento completo
+        return await refine_prompt(prompt_atual, instrucao), []
+
+    selecionadas = select_sections(secoes, instrucao)
+    tentativas = [selecionadas, secoes] if selecionadas and len(selecionadas) < len(secoes) else [secoes]
+
+    for enviadas in tentativas:
+        try:
+            patch = await _request_section_patch(prompt_atual, enviadas, instrucao)
+            if patch.get("precisa_prompt_completo"):
+                continue
+            return apply_patch(prompt_atual, patch, permitidas={s.numero for s in enviadas})
+        except (ValueError, IndexError):
+            FALLBACKS.inc(stage="refine_sections")
+            continue
+
+    return await refine_prompt(prompt_atual, instrucao), []
@@ -0,0 +1,55 @@
+import os
+import hmac
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+
+# ============================================================
+# API KEYS DAS ROTAS DE LEITURA (HISTÓRICO DE PROMPTS)
+# ============================================================
+
+def _parse_keys(texto: str) -> dict[str, Optional[str]]:
+    """
+    "chave1,chave2:42" → {"chave1": None, "chave2": "42"}: a chave sem sufixo
+    vê todos os times; com ":team_id", só o histórico daquele time.
+    """
+    chaves = {}
+    for item in texto.split(","):
+        chave, _, team_id = item.strip().partition(":")
+        if chave:
+            chaves[chave] = team_id or None
+    return chaves
+
+
+PROMPTS_API_KEYS = _parse_keys(os.getenv("PROMPTS_API_KEYS", ""))
+
+
+def request_api_key(request: Request) -> Optional[str]:
+    """API key do header X-API-Key ou Authorization: Bearer."""
+    api_key = request.headers.get("x-api-key")
+    authorization = request.headers.get("authorization", "")
+    if not api_key and authorization.lower().startswith("bearer "):
+        api_key = authorization[7:].strip()
+    return api_key or None
+
+
+def require_prompts_key(request: Request) -> Optional[str]:
+    """
+    Dependência FastAPI do histórico de prompts: exige uma chave de
+    PROMPTS_API_KEYS e retorna o team_id ao qual ela está restrita (None = todos).
+    Sem chaves configuradas, o histórico não é exposto.
+    """
+    if not PROMPTS_API_KEYS:
+        raise HTTPException(status_code=403, detail="Histórico de prompts desabilitado (configure PROMPTS_API_KEYS)")
+    enviada = request_api_key(request)
+    if enviada is not None:
+        for chave, team_id in PROMPTS_API_KEYS.items():
+            if hmac.compare_digest(enviada.encode("utf-8"), chave.encode("utf-8")):
+                return team_id
+    raise HTTPException(status_code=401, detail="API key ausente ou inválida", headers={"WWW-Authenticate": "Bearer"})
+
+
+def check_team_scope(escopo: Optional[str], team_id: str) -> None:
+    if escopo is not None and escopo != team_id:
+        raise HTTPException(status_code=403, detail="API key sem acesso a este time")
@@ -0,0 +1,92 @@
+import re
+
+from catalog_chunker import normalize_name
+from schemas import PromptRequest
+
+
+# ============================================================
+# PRÉ-ANÁLISE LOCAL DO BRIEFING (decide o que precisa de IA)
+# ============================================================
+
+# Campos enviados apenas como contexto para a IA, nunca "sujos" por si só
+CONTEXT_FIELDS = ("nome_empresa", "nome_atendente")
+
+# Texto livre com a intenção do cliente: sem regra local confiável ("Preço só pelo
+# consultor" não tem marcador nenhum), limpo apenas se vazio ou igual ao padrão
+FREE_TEXT_FIELDS = (
+    "regra_preco_texto", "texto_objecoes", "texto_duvida_tecnica", "mensagem_boas_vindas", "proibicoes_texto",
+)
+
+# Frases vagas/pedidos que a IA precisa interpretar (comparadas sem acento, minúsculas)
+VAGUE_MARKERS = (
+    "sugest", "preciso de ajuda", "me ajuda", "acredito", "acho que", "nao sei", "talvez",
+    "gostaria", "quero que", "pode ser", "tanto faz", "qualquer", "a definir", "depende",
+    "verificar", "ver com", "todos os itens", "etc",
+)
+
+# Opções do fluxo principal que não podem ser transbordo imediato (regra Anti-Loop)
+MAIN_PATH_MARKERS = ("orcamento", "cotacao", "agendar", "agendamento", "pedido", "comprar")
+
+_HORARIO_LIMPO = re.compile(r"\b\d{2}:\d{2} às \d{2}:\d{2}\b")
+_NUMERO = re.compile(r"\d+(?::\d+)?")
+_MENCAO_HORARIO = re.compile(r"\b\d{1,2}\s*(?:h|hs|:\d{2})\b|\bdas\s+\d{1,2}\b", re.IGNORECASE)
+
+_DEFAULTS = {nome: campo.default for nome, campo in PromptRequest.model_fields.items() if not campo.is_required()}
+
+
+def _is_empty(valor) -> bool:
+    return valor is None or (isinstance(valor, (str, list, dict)) and not valor)
+
+
+def _is_vague(texto: str) -> bool:
+    normalizado = f" {normalize_name(texto)} "
+    return "?" in texto or any(f" {marca}" in normalizado for marca in VAGUE_MARKERS)
+
+
+def _horario_limpo(texto: str) -> bool:
+    # Todo número deve estar no formato HH:MM e haver ao menos um intervalo "HH:MM às HH:MM"
+    numeros = _NUMERO.findall(texto)
+    return bool(_HORARIO_LIMPO.search(texto)) and all(re.fullmatch(r"\d{2}:\d{2}", n) for n in numeros)
+
+
+def field_needs_ai(campo: str, valor, dados: dict) -> bool:
+    """Regras locais: True se o campo tem algo que só a IA consegue interpretar."""
+    if campo in CONTEXT_FIELDS or _is_empty(valor) or valor == _DEFAULTS.get(campo):
+        return False
+
+    # Campos que o template não renderiza nesta configuração
+    if campo == "mensagem_boas_vindas" and not dados.get("possui_menu"):
+        return False
+    if campo in ("texto_objecoes", "texto_duvida_tecnica") and not dados.get("possui_objecoes"):
+        return False
+
+    if campo in FREE_TEXT_FIELDS:
+        return True
+    if campo == "horario_funcionamento":
+        return not _horario_limpo(valor)
+    if campo == "endereco":
+        # Endereço misturado com horário precisa ser separado
+        return bool(_MENCAO_HORARIO.search(valor)) or _is_vague(valor)
+    if campo == "opcoes_transbordo_imediato":
+        normalizado = normalize_name(valor)
+        return any(marca in normalizado for marca in MAIN_PATH_MARKERS) or _is_vague(valor)
+    if campo == "menu_opcoes":
+        return any(not isinstance(op, str) or len(op) > 60 or _is_vague(op) for op in valor)
+    if campo == "produtos_catalogo":
+        return any(
+            not isinstance(p, dict) or not p.get("nome") or _is_vague(p.get("nome", "")) or "?" in (p.get("precos") or "")
+            for p in valor
+        )
+    # Demais campos: sem regra estruturada, a IA interpreta
+    return True
+
+
+def split_dirty_fields(campos: dict, dados: dict) -> tuple[dict, dict]:
+    """
+    Separa os campos em (sujos, limpos). Os sujos precisam de interpretação da IA;
+    os limpos seguem como estão.
+    """
+    sujos, limpos = {}, {}
+    for campo, valor in campos.items():
+        (sujos if field_needs_ai(campo, valor, dados) else limpos)[campo] = valor
+    return sujos, limpos
@@ -0,0 +1,249 @@
+import os
+import copy
+import json
+import time
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+# ============================================================
+# CACHE ENDEREÇADO POR CONTEÚDO
+# ============================================================
+
+def make_key(*parts: Any) -> str:
+    """
+    Gera uma chave SHA-256 a partir de uma serialização canônica das partes
+    (chaves ordenadas, sem espaços), de modo que dicts equivalentes gerem a mesma chave.
+    """
+    canonical = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class BaseCache:
+    """Interface comum dos backends de cache, com contadores de hit/miss."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._set(key, value)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": len(self),
+        }
+
+    # Implementados pelos backends
+    name = "base"
+
+    def _get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class NullCache(BaseCache):
+    """Cache desligado: nunca armazena nada."""
+
+    name = "off"
+
+    def _get(self, key):
+        return None
+
+    def _set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class MemoryCache(BaseCache):
+    """LRU em memória com expiração por TTL (segundos)."""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def _get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        # Cópia para que o chamador não altere o valor armazenado
+        return copy.deepcopy(value)
+
+    def _set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache em disco (SQLite), compartilhado entre processos da mesma máquina.
+    Valores são armazenados como JSON; a evicção remove os acessados há mais tempo
+    até caber em `maxsize` entradas e, se informado, em `max_bytes` no total.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, maxsize: int = 5000, ttl: float = 86400.0, max_bytes: Optional[int] = None):
+        super().__init__()
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._pid = None
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        # Arquivos criados antes da coluna size
+        colunas = {row[1] for row in self._conn.execute("PRAGMA table_info(cache)")}
+        if "size" not in colunas:
+            self._conn.execute("ALTER TABLE cache ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Conexão SQLite não sobrevive a fork (gunicorn com preload): cada processo abre a sua
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._pid = os.getpid()
+        return self._connection
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def _set(self, key, value):
+        now = time.time()
+        serialized = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)",
+                (key, serialized, now + self.ttl, now, len(serialized.encode("utf-8"))),
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                """DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.maxsize,),
+            )
+            if self.max_bytes is not None:
+                # Mantém as entradas mais recentes cujo tamanho acumulado cabe no limite
+                self._conn.execute(
+                    """DELETE FROM cache WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS acumulado FROM cache
+                        ) WHERE acumulado > ?
+                    )""",
+                    (self.max_bytes,),
+                )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+
+def build_cache(
+    prefix: str,
+    default_ttl: float = 3600.0,
+    default_maxsize: int = 256,
+    default_backend: str = "memory",
+    default_max_bytes: Optional[int] = None,
+) -> BaseCache:
+    """
+    Monta o cache a partir de variáveis de ambiente com o prefixo informado:
+      {PREFIX}_BACKEND   = memory | sqlite | off (padrão: default_backend)
+      {PREFIX}_TTL       = segundos até expirar
+      {PREFIX}_MAXSIZE   = número máximo de entradas
+      {PREFIX}_MAX_BYTES = tamanho máximo total em bytes (só sqlite)
+      {PREFIX}_PATH      = arquivo SQLite (padrão: diretório temporário, gravável no Vercel)
+    """
+    backend = os.getenv(f"{prefix}_BACKEND", default_backend).lower()
+    ttl = float(os.getenv(f"{prefix}_TTL", default_ttl))
+    maxsize = int(os.getenv(f"{prefix}_MAXSIZE", default_maxsize))
+    max_bytes = os.getenv(f"{prefix}_MAX_BYTES")
+    max_bytes = int(max_bytes) if max_bytes else default_max_bytes
+
+    if backend == "off":
+        return NullCache()
+    if backend == "sqlite":
+        path = os.getenv(f"{prefix}_PATH") or os.path.join(tempfile.gettempdir(), f"{prefix.lower()}.sqlite3")
+        return SQLiteCache(path, maxsize=maxsize, ttl=ttl, max_bytes=max_bytes)
+    return MemoryCache(maxsize=maxsize, ttl=ttl)
@@ -0,0 +1,108 @@
+import os
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+from token_budget import CHARS_PER_TOKEN, count_tokens
+
+
+# ============================================================
+# DIVISÃO E MESCLAGEM DE CATÁLOGOS (map-reduce)
+# ============================================================
+
+# Orçamento de tokens de entrada por chunk e limite de chunks (chamadas à IA) por PDF.
+# 60 x 1500 tokens cobre ~290 mil caracteres; o que passar disso é descartado e sinalizado (truncado)
+CHUNK_TOKENS = int(os.getenv("CATALOG_CHUNK_TOKENS", "1500"))
+MAX_CHUNKS = int(os.getenv("CATALOG_MAX_CHUNKS", "60"))
+
+# Similaridade mínima para considerar duas categorias a mesma
+CATEGORY_SIMILARITY = 0.85
+
+PAGE_BREAK = "\f"
+
+
+def estimate_tokens(text: str) -> int:
+    """Mesma contagem usada no orçamento das chamadas (tiktoken ou CHARS_PER_TOKEN)."""
+    return count_tokens(text)
+
+
+def split_into_chunks(raw_text: str, max_tokens: int = CHUNK_TOKENS) -> list[str]:
+    """
+    Divide o texto em chunks dentro do orçamento de tokens, respeitando
+    quebras de página e depois de linha (linhas de tabela nunca são partidas).
+    """
+    blocos = []
+    for pagina in raw_text.split(PAGE_BREAK):
+        if estimate_tokens(pagina) <= max_tokens:
+            blocos.append(pagina)
+        else:
+            blocos.extend(pagina.splitlines())
+
+    chunks = []
+    atual: list[str] = []
+    tokens_atual = 0
+    for bloco in blocos:
+        bloco = bloco.strip()
+        if not bloco:
+            continue
+        tokens = estimate_tokens(bloco)
+        if atual and tokens_atual + tokens > max_tokens:
+            chunks.append("\n".join(atual))
+            atual, tokens_atual = [], 0
+        # Linha isolada maior que o orçamento: corta no limite de caracteres
+        while tokens > max_tokens:
+            corte = int(max_tokens * CHARS_PER_TOKEN)
+            chunks.append(bloco[:corte])
+            bloco = bloco[corte:]
+            tokens = estimate_tokens(bloco)
+        atual.append(bloco)
+        tokens_atual += tokens
+
+    if atual:
+        chunks.append("\n".join(atual))
+    return chunks
+
+
+def normalize_name(nome: str) -> str:
+    """Minúsculas, sem acentos, pontuação ou espaços repetidos."""
+    sem_acento = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", sem_acento.lower()).strip()
+
+
+def merge_catalogs(parciais: list[dict]) -> dict:
+    """
+    Junta os resultados dos chunks em um único {"categorias": [...]},
+    unindo categorias com nomes parecidos e removendo itens duplicados.
+    """
+    categorias: list[dict] = []
+    chaves: list[str] = []
+    itens_vistos: list[set[str]] = []
+
+    for parcial in parciais:
+        for cat in parcial.get("categorias") or []:
+            if not isinstance(cat, dict):
+                continue
+            nome = str(cat.get("categoria") or "").strip()
+            chave = normalize_name(nome)
+            if not chave:
+                continue
+
+            indice = next(
+                (i for i, existente in enumerate(chaves)
+                 if existente == chave or SequenceMatcher(None, existente, chave).ratio() >= CATEGORY_SIMILARITY),
+                None,
+            )
+            if indice is None:
+                categorias.append({"categoria": nome, "itens": []})
+                chaves.append(chave)
+                itens_vistos.append(set())
+                indice = len(categorias) - 1
+
+            for item in cat.get("itens") or []:
+                item = str(item).strip()
+                chave_item = normalize_name(item)
+                if chave_item and chave_item not in itens_vistos[indice]:
+                    itens_vistos[indice].add(chave_item)
+                    categorias[indice]["itens"].append(item)
+
+    return {"categorias": [c for c in categorias if c["itens"]]}
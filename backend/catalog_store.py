@@ -0,0 +1,183 @@
+import os
+import heapq
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Optional
+
+from cache import BaseCache, build_cache, make_key
+from catalog_chunker import normalize_name
+
+
+# ============================================================
+# CATÁLOGOS DE EQUIPAMENTOS NO SERVIDOR (BUSCA E PAGINAÇÃO)
+# ============================================================
+
+# Prefixos indexados por palavra: consultas mais longas filtram os candidatos do maior prefixo
+PREFIX_MAX = 12
+NGRAM = 3
+
+
+def _ngrams(palavra: str) -> set[str]:
+    return {palavra[i:i + NGRAM] for i in range(len(palavra) - NGRAM + 1)}
+
+
+class CatalogIndex:
+    """
+    Catálogo ({"categorias": [{"categoria", "itens"}]}) com índice invertido
+    em memória sobre os nomes de itens e categorias, sem acentos: prefixos de
+    cada palavra para o autocomplete e trigramas para trechos no meio da palavra.
+    """
+
+    def __init__(self, categorias: list[dict]):
+        self.categorias = categorias
+        self.total_itens = sum(len(cat["itens"]) for cat in categorias)
+        # Entrada = (índice da categoria, índice do item ou -1 para a própria categoria)
+        self._entradas: list[tuple[int, int]] = []
+        self._nomes: list[str] = []
+        self._palavras: list[list[str]] = []
+        self._prefixos: defaultdict[str, set[int]] = defaultdict(set)
+        # Prefixos da primeira palavra (nome começando pela consulta) e nomes completos
+        self._inicios: defaultdict[str, set[int]] = defaultdict(set)
+        self._exatos: defaultdict[str, list[int]] = defaultdict(list)
+        self._ngrams: defaultdict[str, set[int]] = defaultdict(set)
+
+        for i, cat in enumerate(categorias):
+            self._add(cat["categoria"], (i, -1))
+            for j, item in enumerate(cat["itens"]):
+                self._add(item, (i, j))
+
+    def _add(self, nome: str, entrada: tuple[int, int]) -> None:
+        eid = len(self._entradas)
+        normalizado = normalize_name(nome)
+        palavras = normalizado.split()
+        self._entradas.append(entrada)
+        self._nomes.append(normalizado)
+        self._palavras.append(palavras)
+        self._exatos[normalizado].append(eid)
+        if palavras:
+            for k in range(1, min(len(palavras[0]), PREFIX_MAX) + 1):
+                self._inicios[palavras[0][:k]].add(eid)
+        for palavra in palavras:
+            for k in range(1, min(len(palavra), PREFIX_MAX) + 1):
+                self._prefixos[palavra[:k]].add(eid)
+            for ngram in _ngrams(palavra):
+                self._ngrams[ngram].add(eid)
+
+    def _prefix_match(self, palavra: str) -> set[int]:
+        candidatos = self._prefixos.get(palavra[:PREFIX_MAX], set())
+        if len(palavra) <= PREFIX_MAX:
+            return candidatos
+        return {eid for eid in candidatos if any(p.startswith(palavra) for p in self._palavras[eid])}
+
+    def _infix_match(self, palavra: str) -> set[int]:
+        ngrams = _ngrams(palavra)
+        if not ngrams:
+            return set()
+        conjuntos = sorted((self._ngrams.get(ngram, set()) for ngram in ngrams), key=len)
+        candidatos = set.intersection(*conjuntos)
+        return {eid for eid in candidatos if palavra in self._nomes[eid]}
+
+    def _match(self, palavras: list[str], buscar) -> set[int]:
+        conjuntos = sorted((buscar(palavra) for palavra in palavras), key=len)
+        return set.intersection(*conjuntos) if conjuntos else set()
+
+    def search(self, q: str, limit: int = 10) -> tuple[list[dict], int]:
+        """
+        Itens e categorias cujos nomes contêm todas as palavras da consulta
+        (início de palavra; se nada casar, trecho no meio). Retorna a página
+        de resultados e o total de correspondências.
+        """
+        consulta = normalize_name(q)
+        palavras = consulta.split()
+        if not palavras:
+            return [], 0
+
+        encontrados = self._match(palavras, self._prefix_match)
+        if not encontrados:
+            encontrados = self._match(palavras, self._infix_match)
+
+        # Nome igual à consulta, depois nome começando por ela, depois a ordem do catálogo
+        exatos = self._exatos.get(consulta, [])
+        melhores = exatos[:limit]
+        if len(melhores) < limit:
+            inicio = self._starts_with(consulta, palavras, encontrados).difference(exatos)
+            melhores += heapq.nsmallest(limit - len(melhores), inicio)
+            if len(melhores) < limit:
+                melhores += heapq.nsmallest(limit - len(melhores), encontrados.difference(inicio, exatos))
+        return [self._resultado(eid) for eid in melhores], len(encontrados)
+
+    def _starts_with(self, consulta: str, palavras: list[str], encontrados: set[int]) -> set[int]:
+        if len(palavras) == 1 and len(consulta) <= PREFIX_MAX:
+            return encontrados & self._inicios.get(consulta, set())
+        return {eid for eid in encontrados if self._nomes[eid].startswith(consulta)}
+
+    def _resultado(self, eid: int) -> dict:
+        i, j = self._entradas[eid]
+        cat = self.categorias[i]
+        return {"indice_categoria": i, "categoria": cat["categoria"], "item": cat["itens"][j] if j >= 0 else None}
+
+    def page(self, limit: int, offset: int) -> list[dict]:
+        return [
+            {"indice": offset + k, "total_itens": len(cat["itens"]), **cat}
+            for k, cat in enumerate(self.categorias[offset:offset + limit])
+        ]
+
+
+class CatalogStore:
+    """
+    Catálogos guardados pelo hash do conteúdo (o mesmo catálogo tem sempre o
+    mesmo id). O JSON fica no cache persistente, compartilhado entre os workers;
+    o índice é montado sob demanda em cada processo e mantido num LRU.
+    """
+
+    def __init__(self, persisted: BaseCache, max_indexes: int = 64):
+        self.persisted = persisted
+        self.max_indexes = max_indexes
+        self._indexes: OrderedDict[str, CatalogIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, categorias: list[dict]) -> str:
+        catalog_id = make_key("catalog", categorias)[:32]
+        if self.cached(catalog_id) is None:
+            if self.persisted.get(catalog_id) is None:
+                self.persisted.set(catalog_id, {"categorias": categorias})
+            self._remember(catalog_id, CatalogIndex(categorias))
+        return catalog_id
+
+    def cached(self, catalog_id: str) -> Optional[CatalogIndex]:
+        with self._lock:
+            index = self._indexes.get(catalog_id)
+            if index is not None:
+                self._indexes.move_to_end(catalog_id)
+            return index
+
+    def get(self, catalog_id: str) -> Optional[CatalogIndex]:
+        index = self.cached(catalog_id)
+        if index is not None:
+            return index
+
+        salvo = self.persisted.get(catalog_id)
+        if salvo is None:
+            return None
+        index = CatalogIndex(salvo["categorias"])
+        self._remember(catalog_id, index)
+        return index
+
+    def _remember(self, catalog_id: str, index: CatalogIndex) -> None:
+        with self._lock:
+            self._indexes[catalog_id] = index
+            self._indexes.move_to_end(catalog_id)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+
+
+def build_catalog_store() -> CatalogStore:
+    """
+    CATALOG_STORE_* = cache persistente dos catálogos (ver build_cache; padrão sqlite, 30 dias)
+    CATALOG_INDEX_MAXSIZE = índices mantidos em memória por processo
+    """
+    persisted = build_cache(
+        "CATALOG_STORE", default_ttl=30 * 86400, default_maxsize=1000, default_backend="sqlite",
+        default_max_bytes=50 * 1024 * 1024,
+    )
+    return CatalogStore(persisted, int(os.getenv("CATALOG_INDEX_MAXSIZE", "64")))
@@ -0,0 +1,51 @@
+"""
+Perfil de produção (VM): gunicorn gerenciando workers uvicorn.
+
+Uso (a partir de backend/):
+    gunicorn -c gunicorn.conf.py main:app
+ou pela raiz:
+    ./start.sh prod
+
+Tudo pode ser ajustado por variáveis de ambiente (GUNICORN_*, PORT).
+"""
+import os
+import multiprocessing
+
+_cores = multiprocessing.cpu_count()
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# A aplicação é I/O-bound (espera da OpenAI): um worker async por núcleo
+workers = int(os.getenv("GUNICORN_WORKERS", str(_cores)))
+
+# Carrega main uma vez no master e faz fork (imports compartilhados, boot mais rápido).
+# Recursos com estado (SQLite, cliente OpenAI, workers de jobs) são abertos em cada worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes", "on")
+
+# Chamadas de refine/preprocess podem levar dezenas de segundos (com retries)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# No deploy (SIGTERM/HUP), o worker para de aceitar conexões e espera as requisições em andamento
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "90"))
+# Maior que o idle timeout típico de load balancers (60s), para não fechar conexões que eles reutilizam
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+
+# Recicla workers periodicamente (limita crescimento de memória), com jitter para não reiniciar todos juntos
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+# Heartbeat dos workers em memória em vez de disco
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+# Cada worker teria seu próprio pool de extração de PDF com um processo por núcleo;
+# divide os núcleos entre os workers para não criar workers x núcleos processos
+os.environ.setdefault("PDF_WORKERS", str(max(1, _cores // max(1, workers))))
+
+# Produção: sem checagem de mtime de templates/frontend a cada requisição e sem POST /templates/reload
+os.environ.setdefault("TEMPLATES_AUTO_RELOAD", "0")
+os.environ.setdefault("STATIC_AUTO_RELOAD", "0")
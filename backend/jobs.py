@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import sqlite3
+import asyncio
+import tempfile
+import ipaddress
+import threading
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlsplit
+
+
+# ============================================================
+# FILA DE JOBS EM SQLITE (sem broker externo)
+# ============================================================
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH") or os.path.join(tempfile.gettempdir(), "gerador_jobs.sqlite3")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_RESULT_TTL = float(os.getenv("JOBS_RESULT_TTL", "86400"))
+# Jobs "running" sem atualização por mais que isso são considerados órfãos (worker morreu)
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "300"))
+# Enquanto o handler roda, o worker renova o lease (updated_at) neste intervalo
+JOBS_HEARTBEAT_INTERVAL = float(os.getenv("JOBS_HEARTBEAT_INTERVAL", str(JOBS_LEASE_SECONDS / 3)))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "0.5"))
+# Callbacks só para hosts públicos; 1 libera localhost/rede interna (desenvolvimento)
+JOBS_CALLBACK_ALLOW_PRIVATE = os.getenv("JOBS_CALLBACK_ALLOW_PRIVATE", "0").lower() in ("1", "true", "yes", "on")
+
+Handler = Callable[[dict], Awaitable[Any]]
+
+
+class PermanentJobError(Exception):
+    """Erro que não se resolve tentando de novo (ex.: PDF inválido)."""
+
+
+class InvalidCallbackError(ValueError):
+    """callback_url que não é http(s) ou aponta para a rede interna."""
+
+
+async def check_callback_url(url: str) -> None:
+    """
+    Aceita só http(s) para hosts cujos endereços são todos públicos: bloqueia
+    localhost, redes privadas, link-local (metadados de nuvem, 169.254.169.254) etc.
+    Refeita antes de cada envio, pois o DNS pode mudar depois do submit.
+    """
+    partes = urlsplit(url)
+    if partes.scheme not in ("http", "https") or not partes.hostname:
+        raise InvalidCallbackError("callback_url deve ser uma URL http(s)")
+    if JOBS_CALLBACK_ALLOW_PRIVATE:
+        return
+    try:
+        porta = partes.port or (443 if partes.scheme == "https" else 80)
+        enderecos = await asyncio.get_running_loop().getaddrinfo(partes.hostname, porta, type=socket.SOCK_STREAM)
+    except (OSError, ValueError):
+        raise InvalidCallbackError("Host do callback_url não encontrado")
+    for *_, sockaddr in enderecos:
+        ip = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if not ip.is_global or ip.is_multicast:
+            raise InvalidCallbackError("callback_url não pode apontar para endereços internos")
+
+
+class JobQueue:
+    """
+    Fila persistente: submit() grava o job e retorna o id na hora;
+    workers fazem claim() atômico, e o job termina em done ou, após
+    esgotar as tentativas, em failed. Resultados expiram após o TTL.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH, max_attempts: int = JOBS_MAX_ATTEMPTS, result_ttl: float = JOBS_RESULT_TTL):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                result TEXT,
+                error TEXT,
+                callback_url TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                run_after REAL NOT NULL,
+                expires_at REAL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs(status, run_after)")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Conexão SQLite não sobrevive a fork (gunicorn com preload): cada processo abre a sua
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA busy_timeout=5000")
+            self._pid = os.getpid()
+        return self._connection
+
+    def submit(self, kind: str, payload: dict, callback_url: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO jobs (id, kind, payload, status, max_attempts, callback_url, created_at, updated_at, run_after)
+                   VALUES (?, ?, ?, 'pending', ?, ?, ?, ?, ?)""",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), self.max_attempts, callback_url, now, now, now),
+            )
+        return job_id
+
+    def claim(self) -> Optional[dict]:
+        """
+        Pega o próximo job pendente e o marca como running (transação exclusiva).
+        Jobs running sem heartbeat além do lease são órfãos (o worker morreu): voltam
+        a rodar enquanto houver tentativas; esgotadas, vão para failed.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    """UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, expires_at = ?
+                       WHERE status = 'running' AND updated_at < ? AND attempts >= max_attempts""",
+                    ("Worker interrompido durante a execução; tentativas esgotadas", now, now + self.result_ttl,
+                     now - JOBS_LEASE_SECONDS),
+                )
+                row = self._conn.execute(
+                    """SELECT * FROM jobs
+                       WHERE (status = 'pending' AND run_after <= ?)
+                          OR (status = 'running' AND updated_at < ?)
+                       ORDER BY run_after LIMIT 1""",
+                    (now, now - JOBS_LEASE_SECONDS),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (now, row["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = dict(row)
+        job["attempts"] += 1
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def heartbeat(self, job_id: str) -> None:
+        """Renova o lease do job em execução (evita que outro worker o pegue como órfão)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'running'", (time.time(), job_id),
+            )
+
+    def complete(self, job_id: str, result: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, updated_at = ?, expires_at = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False), now, now + self.result_ttl, job_id),
+            )
+
+    def fail(self, job_id: str, error: str, attempts: int, max_attempts: int, permanent: bool = False) -> bool:
+        """Registra a falha. Retorna True se o job voltou para a fila (ainda há tentativas)."""
+        now = time.time()
+        retry = not permanent and attempts < max_attempts
+        with self._lock:
+            if retry:
+                # Backoff exponencial com jitter entre tentativas
+                delay = min(60.0, 2 ** attempts) * random.uniform(0.5, 1.0)
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'pending', error = ?, updated_at = ?, run_after = ? WHERE id = ?",
+                    (error, now, now + delay, job_id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, expires_at = ? WHERE id = ?",
+                    (error, now, now + self.result_ttl, job_id),
+                )
+        return retry
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT id, kind, status, attempts, max_attempts, result, error, created_at, updated_at, expires_at
+                   FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)""",
+                (job_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class JobWorkers:
+    """Workers asyncio que consomem a fila e chamam o handler registrado para cada tipo de job."""
+
+    def __init__(self, queue: JobQueue, concurrency: int = JOBS_WORKERS):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.handlers: dict[str, Handler] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = False
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self.handlers[kind] = handler
+
+    def start(self) -> None:
+        self._stopping = False
+        self._tasks = [asyncio.ensure_future(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Para de pegar jobs novos e espera os que estão rodando terminarem (até o timeout)."""
+        self._stopping = True
+        if self._tasks:
+            _, pendentes = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pendentes:
+                task.cancel()
+        self._tasks = []
+
+    async def _run(self) -> None:
+        ultima_limpeza = 0.0
+        while not self._stopping:
+            # SQLite (BEGIN IMMEDIATE pode esperar o busy_timeout) em thread, fora do event loop
+            if time.monotonic() - ultima_limpeza > 60:
+                await asyncio.to_thread(self.queue.purge_expired)
+                ultima_limpeza = time.monotonic()
+
+            job = await asyncio.to_thread(self.queue.claim)
+            if job is None:
+                await asyncio.sleep(JOBS_POLL_INTERVAL)
+                continue
+            await self._execute(job)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(JOBS_HEARTBEAT_INTERVAL)
+            try:
+                await asyncio.to_thread(self.queue.heartbeat, job_id)
+            except sqlite3.Error:
+                # Falha pontual (ex.: banco ocupado): tenta de novo no próximo intervalo
+                continue
+
+    async def _execute(self, job: dict) -> None:
+        handler = self.handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise PermanentJobError(f"Tipo de job desconhecido: {job['kind']}")
+            heartbeat = asyncio.ensure_future(self._heartbeat(job["id"]))
+            try:
+                result = await handler(job["payload"])
+            finally:
+                heartbeat.cancel()
+        except Exception as e:
+            permanent = isinstance(e, PermanentJobError)
+            if await asyncio.to_thread(self.queue.fail, job["id"], str(e), job["attempts"], job["max_attempts"], permanent):
+                return
+            await self._callback(job, {"job_id": job["id"], "status": "failed", "error": str(e)})
+            return
+
+        await asyncio.to_thread(self.queue.complete, job["id"], result)
+        await self._callback(job, {"job_id": job["id"], "status": "done", "result": result})
+
+    async def _callback(self, job: dict, body: dict) -> None:
+        if not job.get("callback_url"):
+            return
+        try:
+            await check_callback_url(job["callback_url"])
+        except InvalidCallbackError:
+            return
+        import httpx
+
+        # Falha no callback não muda o status: o resultado continua disponível em /jobs/{id}
+        for tentativa in range(3):
+            try:
+                async with httpx.AsyncClient(timeout=10.0) as client:
+                    response = await client.post(job["callback_url"], json=body)
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(2 ** tentativa)
@@ -5,19 +5,86 @@ from pathlib import Path
 # Garante que o diretório backend está no sys.path (necessário para Vercel)
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, Body, Depends, HTTPException, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from jinja2 import Environment, FileSystemLoader, TemplateNotFound
-import io
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response, StreamingResponse
+from jinja2 import TemplateNotFound
+from pydantic import TypeAdapter, ValidationError
+import json
+import time
+import base64
+import asyncio
+from typing import Annotated, Optional, Union
+from contextlib import asynccontextmanager
+
+from schemas import (
+    PromptRequest, PromptResponse, RefineRequest, RefineResponse, GoogleFormWebhook, LocadoraPromptRequest,
+    GenerateRequest,
+    BatchGenerateRequest, BatchGenerateResponse, BatchItemResult, JobSubmitResponse, JobStatus,
+    PaginaEmpresas, PaginaVersoes, PromptVersao,
+    CatalogoEstruturado, CatalogoSalvo, BuscaCatalogo, PaginaCategorias,
+)
+from template_registry import TemplateRegistry
+from cache import build_cache, make_key
+from static_assets import CompressionMiddleware, StaticAsset, etag_matches
+from jobs import InvalidCallbackError, JobQueue, JobWorkers, PermanentJobError, check_callback_url
+from prompt_store import build_prompt_store
+from pdf_upload import SpooledPdf, UploadSizeLimitMiddleware, spool_bytes, spool_upload
+from catalog_chunker import PAGE_BREAK
+from catalog_store import CatalogIndex, build_catalog_store
+from ai_service import (
+    refine_prompt, refine_prompt_stream, refine_prompt_sections, preprocess_briefing, structure_catalog_from_text,
+    close_client, warm_client,
+)
+from openai_client import CircuitOpenError
+from rate_limit import ConcurrencySlotMiddleware, UpstreamBusyError, rate_limit
+from auth import check_team_scope, require_prompts_key
+from token_budget import ContextOverflowError, warm_encodings
+from metrics import (
+    FALLBACKS, REQUEST_DURATION, SERVER_TIMING, registry, server_timing_header, stage, start_request_timings,
+)
+
+
+# Fora do Vercel o cliente da OpenAI é criado no startup de cada worker, não na primeira requisição
+WARM_OPENAI_CLIENT = os.getenv("WARM_OPENAI_CLIENT", "0" if os.getenv("VERCEL") else "1").lower() in ("1", "true", "yes", "on")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup: compila templates, carrega o frontend comprimido e os tokenizers em cache,
+    prepara o cliente da OpenAI e inicia os workers de jobs.
+    Shutdown: espera os jobs em andamento, fecha o pool HTTP da OpenAI e os workers de PDF.
+    """
+    template_registry.warm()
+    frontend.load()
+    warm_encodings()
+    if WARM_OPENAI_CLIENT:
+        warm_client()
+    job_workers.start()
+    yield
+    await job_workers.stop()
+    await close_client()
+    # O extrator só é importado no primeiro upload; sem ele não há pool para fechar
+    if "pdf_extractor" in sys.modules:
+        sys.modules["pdf_extractor"].shutdown_executor()
+
+
+def _default_response_class():
+    # orjson é opcional: serializa prompts/catálogos grandes bem mais rápido que o json da stdlib
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return JSONResponse
+    return ORJSONResponse
 
-from schemas import PromptRequest, PromptResponse, RefineRequest, RefineResponse, GoogleFormWebhook, LocadoraPromptRequest
-from ai_service import refine_prompt, preprocess_briefing, structure_catalog_from_text
 
 app = FastAPI(
     title="Gerador de Prompts para IA",
     description="API para gerar e refinar prompts de atendentes de WhatsApp",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=_default_response_class(),
 )
 
 # CORS
@@ -29,12 +96,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Caminho do index.html (pasta pai do backend)
-index_path = Path(__file__).parent.parent / "index.html"
+# Compressão das respostas grandes (prompts em JSON); o frontend já vai pré-comprimido
+app.add_middleware(CompressionMiddleware)
 
-# Configuração do Jinja2
-templates_dir = Path(__file__).parent / "templates"
-jinja_env = Environment(loader=FileSystemLoader(templates_dir), trim_blocks=True, lstrip_blocks=True)
+# Uploads de PDF com Content-Length acima do limite são recusados antes de ler o corpo
+app.add_middleware(UploadSizeLimitMiddleware, paths=("/upload-pdf", "/jobs/upload-pdf"))
+
+# Vagas de concorrência do rate_limit presas até o fim da resposta (inclusive streams)
+app.add_middleware(ConcurrencySlotMiddleware)
+
+# index.html (pasta pai do backend), mantido em memória com gzip/brotli e ETag
+index_path = Path(__file__).parent.parent / "index.html"
+frontend = StaticAsset(index_path, "text/html; charset=utf-8")
 
 # Mapeamento de templates
 TEMPLATE_MAP = {
@@ -42,85 +115,289 @@ TEMPLATE_MAP = {
     "locadora_equipamentos": "locadora_equipamentos.jinja2",
 }
 
+# Configuração do Jinja2 (templates compilados uma vez e mantidos em memória)
+templates_dir = Path(__file__).parent / "templates"
+template_registry = TemplateRegistry(templates_dir, TEMPLATE_MAP)
+
+# Fila de jobs em SQLite, consumida por workers no próprio processo
+job_queue = JobQueue()
+job_workers = JobWorkers(job_queue)
+
+# Resultado do /upload-pdf (texto + categorias) por SHA-256 do arquivo, em disco com LRU por tamanho
+pdf_cache = build_cache(
+    "PDF_CACHE", default_ttl=7 * 86400, default_maxsize=500, default_backend="sqlite", default_max_bytes=50 * 1024 * 1024,
+)
+registry.callback(
+    "pdf_cache_requests_total", "Consultas ao cache de PDFs processados por resultado", "counter",
+    lambda: {(("result", "hit"),): pdf_cache.hits, (("result", "miss"),): pdf_cache.misses},
+)
+
+# Prompts renderizados dos templates determinísticos (sem IA no caminho), por hash do
+# modelo validado + hash do arquivo do template; em memória e limitado por RENDER_CACHE_MAXSIZE
+render_cache = build_cache("RENDER_CACHE", default_ttl=3600, default_maxsize=256)
+registry.callback(
+    "render_cache_requests_total", "Consultas ao cache de renderização por resultado", "counter",
+    lambda: {(("result", "hit"),): render_cache.hits, (("result", "miss"),): render_cache.misses},
+)
+
+# Histórico de prompts por empresa (SQLite/WAL; PROMPT_STORE_BACKEND=off desliga)
+prompt_store = build_prompt_store()
+
+# Catálogos de equipamentos por hash do conteúdo, com índice de busca em memória
+catalog_store = build_catalog_store()
+
+
+async def _save_prompt(nome_empresa: str, team_id: str, prompt: str, origem: str, **extra) -> None:
+    """
+    Salva a versão no histórico, em thread (BEGIN IMMEDIATE pode esperar o
+    busy_timeout). Falha no armazenamento não derruba a geração.
+    """
+    with stage("store"):
+        try:
+            await asyncio.to_thread(prompt_store.save, nome_empresa, team_id, prompt, origem, **extra)
+        except Exception:
+            FALLBACKS.inc(stage="prompt_store")
+
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Registra a duração por rota e, se SERVER_TIMING=1, devolve as etapas no header Server-Timing."""
+    timings = start_request_timings()
+    inicio = time.perf_counter()
+    response = await call_next(request)
+    duracao = time.perf_counter() - inicio
+
+    route = request.scope.get("route")
+    REQUEST_DURATION.observe(
+        duracao,
+        method=request.method,
+        route=getattr(route, "path", "desconhecida"),
+        status=response.status_code,
+    )
+    if SERVER_TIMING:
+        timings.append(("total", duracao))
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
 
 @app.get("/")
-async def root():
-    """Serve o frontend"""
-    if index_path.exists():
-        return FileResponse(index_path)
+async def root(request: Request):
+    """Serve o frontend (304 se o ETag do navegador ainda vale)"""
+    response = frontend.response(request)
+    if response is not None:
+        return response
     return {"message": "API Gerador de Prompts"}
 
 
-@app.post("/generate", response_model=PromptResponse)
-async def generate_prompt(request: dict):
+# Validação dos itens do lote (o /generate recebe o corpo já validado pelo FastAPI)
+generate_request_adapter = TypeAdapter(GenerateRequest)
+
+# O atendente_geral passa pelo pré-processamento com IA: mesma entrada não garante mesmo prompt
+DETERMINISTIC_TEMPLATES = {"locadora_equipamentos"}
+
+
+def _render_key(template_type: str, data) -> str:
+    """Hash canônico do modelo validado + hash do template: mesma chave, mesmo prompt."""
+    try:
+        fingerprint = template_registry.fingerprint(template_type)
+    except TemplateNotFound:
+        raise HTTPException(status_code=500, detail="Template não encontrado")
+    return make_key("render", template_type, fingerprint, type(data).__name__, data.model_dump(mode="json"))
+
+
+def _render_etag(chave: str) -> str:
+    return f'W/"{chave[:32]}"'
+
+
+def _not_modified(request: Request, response: Response, chave: str) -> Optional[Response]:
+    """304 se o cliente já tem este prompt (If-None-Match); senão marca o ETag na resposta."""
+    etag = _render_etag(chave)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+
+async def _build_prompt(validated: Union[PromptRequest, LocadoraPromptRequest], chave: Optional[str] = None) -> str:
     """
-    Gera um prompt completo baseado nos dados fornecidos.
-    Detecta o tipo de template e usa o schema correto.
+    Pré-processa (atendente_geral) e renderiza o prompt a partir dos dados já
+    validados pelo schema do template. Usado por /generate e /generate/batch.
+    Templates determinísticos passam pelo cache de renderização.
     """
-    template_type = request.get("template_type", "atendente_geral")
-    template_name = TEMPLATE_MAP.get(template_type)
+    template_type = validated.template_type
 
-    if not template_name:
+    if template_type not in TEMPLATE_MAP:
         raise HTTPException(status_code=400, detail="Tipo de template inválido")
 
+    if chave is None and template_type in DETERMINISTIC_TEMPLATES:
+        chave = _render_key(template_type, validated)
+    if chave is not None:
+        prompt = render_cache.get(chave)
+        if prompt is not None:
+            # Já renderizado com exatamente estes dados; o histórico só ganha versão
+            # se a última for outra (ex.: A → refine B → A de novo)
+            await _save_prompt(
+                validated.nome_empresa, validated.team_id, prompt, "generate",
+                template_type=template_type, briefing=validated.model_dump_json(),
+            )
+            return prompt
+
     try:
-        template = jinja_env.get_template(template_name)
+        template = template_registry.get(template_type)
     except TemplateNotFound:
         raise HTTPException(status_code=500, detail="Template não encontrado")
 
-    # Validar com o schema correto
-    if template_type == "locadora_equipamentos":
-        validated = LocadoraPromptRequest(**request)
-    else:
-        validated = PromptRequest(**request)
-
-    dados_originais = validated.model_dump()
-
     # Pré-processar briefing com IA (apenas para atendente_geral)
     if template_type == "atendente_geral":
-        try:
-            dados_processados = await preprocess_briefing(dados_originais)
-        except Exception:
-            dados_processados = dados_originais
+        dados_originais = validated.model_dump()
+        with stage("preprocess"):
+            try:
+                contexto = await preprocess_briefing(dados_originais)
+            except Exception:
+                FALLBACKS.inc(stage="preprocess")
+                contexto = dados_originais
     else:
-        dados_processados = dados_originais
+        # Locadora: os atributos do modelo vão direto para o template, sem model_dump
+        contexto = dict(validated)
+        if validated.catalog_id and not validated.categorias_equipamentos:
+            contexto["categorias_equipamentos"] = (await _catalog_or_404(validated.catalog_id)).categorias
 
     # Renderizar o template com os dados processados
-    prompt = template.render(**dados_processados)
+    with stage("render"):
+        prompt = template.render(**contexto)
+
+    await _save_prompt(
+        validated.nome_empresa, validated.team_id, prompt, "generate",
+        template_type=template_type, briefing=validated.model_dump_json(),
+    )
+    if chave is not None:
+        render_cache.set(chave, prompt)
+    return prompt
+
+
+@app.post("/generate", response_model=PromptResponse, dependencies=[Depends(rate_limit("generate"))])
+async def generate_prompt(request: Annotated[GenerateRequest, Body()], http_request: Request, response: Response):
+    """
+    Gera um prompt completo baseado nos dados fornecidos.
+    O template_type escolhe o schema (atendente_geral se omitido).
+    Templates determinísticos respondem com ETag e 304 para If-None-Match igual
+    (depois de consultar o cache de renderização, para registrar a versão no histórico).
+    """
+    chave = None
+    if request.template_type in DETERMINISTIC_TEMPLATES:
+        chave = _render_key(request.template_type, request)
 
+    prompt = await _build_prompt(request, chave)
+
+    if chave is not None:
+        not_modified = _not_modified(http_request, response, chave)
+        if not_modified is not None:
+            return not_modified
     return PromptResponse(prompt=prompt)
 
 
-@app.post("/upload-pdf")
+# Limites do processamento em lote (configuráveis por ambiente)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "5"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "20"))
+BATCH_ITEM_TIMEOUT = float(os.getenv("BATCH_ITEM_TIMEOUT", "60"))
+
+
+async def _build_batch_item(indice: int, item: dict, semaphore: asyncio.Semaphore, timeout: float) -> BatchItemResult:
+    """Gera um item do lote, convertendo qualquer falha em erro do próprio item."""
+    async with semaphore:
+        try:
+            with stage("validation"):
+                validated = generate_request_adapter.validate_python(item)
+            prompt = await asyncio.wait_for(_build_prompt(validated), timeout=timeout)
+            return BatchItemResult(indice=indice, success=True, prompt=prompt)
+        except asyncio.TimeoutError:
+            erro = f"Tempo esgotado após {timeout:g}s"
+        except ValidationError as e:
+            erro = "; ".join(
+                f"{'.'.join(map(str, err['loc'][1:]))}: {err['msg']}" if len(err["loc"]) > 1 else err["msg"]
+                for err in e.errors()
+            )
+        except HTTPException as e:
+            erro = e.detail
+        except Exception as e:
+            erro = str(e)
+    return BatchItemResult(indice=indice, success=False, erro=erro)
+
+
+@app.post("/generate/batch", response_model=BatchGenerateResponse, dependencies=[Depends(rate_limit("batch"))])
+async def generate_batch(request: BatchGenerateRequest):
+    """
+    Gera vários prompts de uma vez, pré-processando em paralelo
+    com concorrência limitada e timeout por item.
+
+    Com "stream": true a resposta é NDJSON, uma linha por item na ordem de conclusão.
+    """
+    if not request.itens:
+        raise HTTPException(status_code=400, detail="Lista de itens vazia")
+
+    if len(request.itens) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_ITEMS} itens por lote")
+
+    concorrencia = min(max(request.concorrencia or BATCH_CONCURRENCY, 1), BATCH_MAX_CONCURRENCY)
+    timeout = request.timeout_item or BATCH_ITEM_TIMEOUT
+    semaphore = asyncio.Semaphore(concorrencia)
+
+    tarefas = [
+        asyncio.ensure_future(_build_batch_item(i, item, semaphore, timeout))
+        for i, item in enumerate(request.itens)
+    ]
+
+    if request.stream:
+        async def ndjson_stream():
+            try:
+                for proxima in asyncio.as_completed(tarefas):
+                    resultado = await proxima
+                    yield resultado.model_dump_json() + "\n"
+            finally:
+                # Cliente desconectou: não deixa chamadas de IA órfãs
+                for tarefa in tarefas:
+                    tarefa.cancel()
+
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+    resultados = await asyncio.gather(*tarefas)
+    sucesso = sum(1 for r in resultados if r.success)
+
+    return BatchGenerateResponse(
+        total=len(resultados),
+        sucesso=sucesso,
+        falhas=len(resultados) - sucesso,
+        resultados=resultados,
+    )
+
+
+@app.post("/upload-pdf", dependencies=[Depends(rate_limit("pdf"))])
 async def upload_pdf(file: UploadFile = File(...)):
     """
     Recebe um PDF, extrai texto e usa IA para estruturar
     o catálogo de equipamentos em categorias.
     """
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Apenas arquivos PDF são aceitos")
+    # Lido em blocos para disco: tamanho e %PDF conferidos durante a leitura
+    with await spool_upload(file) as pdf:
+        return await _process_pdf(pdf)
 
-    contents = await file.read()
 
-    if len(contents) > 4 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="Arquivo muito grande (máx 4MB)")
+async def _process_pdf(pdf: SpooledPdf) -> dict:
+    """Extrai o texto do PDF e estrutura o catálogo. Usado por /upload-pdf e pelos jobs."""
+    # O mesmo arquivo reenviado não passa de novo pela extração nem pela IA
+    cache_key = pdf.sha256
+    # Com PDF_CACHE_BACKEND=sqlite é I/O de disco: fora do event loop
+    cached = await asyncio.to_thread(pdf_cache.get, cache_key)
+    if cached is not None:
+        return await _pdf_response(cached, from_cache=True)
 
-    # Import lazy para não impactar cold start
-    import pdfplumber
+    # Extração em pool de workers (pdfplumber é importado só dentro deles)
+    from pdf_extractor import extract_pdf_text
 
-    extracted_text = ""
     try:
-        with pdfplumber.open(io.BytesIO(contents)) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    extracted_text += page_text + "\n"
-
-                tables = page.extract_tables()
-                for table in tables:
-                    for row in table:
-                        cleaned = [cell or "" for cell in row]
-                        extracted_text += " | ".join(cleaned) + "\n"
+        with stage("pdf_extract"):
+            extracted_text = await extract_pdf_text(pdf.path)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro ao processar PDF: {str(e)}")
 
@@ -131,69 +408,72 @@ async def upload_pdf(file: UploadFile = File(...)):
         )
 
     # Usar IA para estruturar o catálogo
-    try:
-        structured = await structure_catalog_from_text(extracted_text)
-    except Exception:
-        structured = {"categorias": []}
-
-    return {
-        "success": True,
-        "raw_text": extracted_text[:5000],
-        "categorias": structured.get("categorias", []),
+    with stage("structure"):
+        try:
+            structured = await structure_catalog_from_text(extracted_text)
+        except Exception:
+            FALLBACKS.inc(stage="structure")
+            structured = None
+
+    resultado = {
+        "raw_text": extracted_text.replace(PAGE_BREAK, "")[:5000],
+        "categorias": (structured or {}).get("categorias", []),
+        # O catálogo passou de CATALOG_MAX_CHUNKS: as categorias não cobrem o PDF inteiro
+        "truncado": bool((structured or {}).get("truncado")),
     }
+    # Falha da IA não entra no cache: o próximo envio tenta estruturar de novo
+    if structured is not None:
+        await asyncio.to_thread(pdf_cache.set, cache_key, resultado)
+    return await _pdf_response(resultado, from_cache=False)
+
 
+async def _pdf_response(resultado: dict, from_cache: bool) -> dict:
+    # As categorias também ficam salvas no servidor, para busca e paginação em /catalog/{id}
+    catalog_id = None
+    if resultado["categorias"]:
+        catalog_id = await asyncio.to_thread(catalog_store.save, resultado["categorias"])
+    return {"success": True, "truncado": False, **resultado, "catalog_id": catalog_id, "from_cache": from_cache}
 
-@app.post("/webhook/google-forms")
-async def webhook_google_forms(data: GoogleFormWebhook):
+
+@app.post("/webhook/google-forms", dependencies=[Depends(rate_limit("webhook"))])
+async def webhook_google_forms(data: GoogleFormWebhook, request: Request, response: Response):
     """
     Recebe dados do Google Forms via Apps Script e gera o prompt.
 
     O Google Apps Script deve mapear os campos do form para este schema.
+    Responde com ETag e 304 para If-None-Match igual (a versão entra no histórico mesmo assim).
     """
-    try:
-        template = jinja_env.get_template("base_atendente.jinja2")
-    except TemplateNotFound:
-        raise HTTPException(status_code=500, detail="Template não encontrado")
+    chave = _render_key("atendente_geral", data)
+    resultado = await _render_webhook(data, chave)
+    not_modified = _not_modified(request, response, chave)
+    if not_modified is not None:
+        return not_modified
+    return resultado
 
-    # Converter para PromptRequest (com valores padrão para campos não preenchidos)
-    prompt_data = {
-        "nome_empresa": data.nome_empresa,
-        "nome_atendente": data.nome_atendente,
-        "papel_ia": data.papel_ia,
-        "estilo_comunicacao": data.estilo_comunicacao or "Máximo 2 frases curtas por parágrafo",
-        "proibicoes_texto": data.proibicoes_texto,
-        "possui_menu": data.possui_menu if data.possui_menu is not None else bool(data.menu_opcoes),
-        "mensagem_boas_vindas": data.mensagem_boas_vindas,
-        "menu_opcoes": data.menu_opcoes or [],
-        "frase_autoridade": data.frase_autoridade,
-        "servicos_lista": data.servicos_lista or [],
-        "endereco": data.endereco,
-        "horario_funcionamento": data.horario_funcionamento,
-        "regras_personalizadas": data.regras_personalizadas or [],
-        "regra_marcas_texto": data.regra_marcas_texto,
-        "regra_preco_texto": data.regra_preco_texto,
-        "produtos_catalogo": [{"nome": p.nome, "precos": p.precos} for p in (data.produtos_catalogo or [])],
-        "frase_sondagem": data.frase_sondagem,
-        "pergunta_experiencia": data.pergunta_experiencia,
-        "possui_treinamento": data.possui_treinamento or False,
-        "texto_treinamento": data.texto_treinamento,
-        "pergunta_data": data.pergunta_data,
-        "texto_verificacao_cadastro": data.texto_verificacao_cadastro,
-        "texto_documentacao": data.texto_documentacao,
-        "possui_objecoes": data.possui_objecoes or False,
-        "texto_objecoes": data.texto_objecoes,
-        "regras_comunicacao": data.regras_comunicacao or [],
-        "opcoes_transbordo_imediato": data.opcoes_transbordo_imediato,
-        "opcoes_transbordo_extras": data.opcoes_transbordo_extras,
-        "team_id": data.team_id,
-        "url_chatwoot": data.url_chatwoot,
-        "apikey_chatwoot": data.apikey_chatwoot,
-        "guardrails_extras": data.guardrails_extras or [],
-        "instrucao_final": data.instrucao_final,
-    }
 
-    # Renderizar o template
-    prompt = template.render(**prompt_data)
+async def _render_webhook(data: GoogleFormWebhook, chave: Optional[str] = None) -> dict:
+    """Renderiza o prompt do atendente a partir do formulário. Usado pelo webhook e pelos jobs."""
+    chave = chave or _render_key("atendente_geral", data)
+    prompt = render_cache.get(chave)
+
+    if prompt is None:
+        try:
+            template = template_registry.get("atendente_geral")
+        except TemplateNotFound:
+            raise HTTPException(status_code=500, detail="Template não encontrado")
+
+        # Atributos do formulário direto no contexto (com valores padrão para campos não preenchidos)
+        prompt_data = data.render_context()
+
+        # Renderizar o template
+        with stage("render"):
+            prompt = template.render(**prompt_data)
+        render_cache.set(chave, prompt)
+
+    # Também no acerto do cache: nova versão no histórico só se a última for outra (A → refine B → A)
+    await _save_prompt(
+        data.nome_empresa, data.team_id, prompt, "webhook", template_type="atendente_geral", briefing=data.model_dump_json(),
+    )
 
     return {
         "success": True,
@@ -202,7 +482,66 @@ async def webhook_google_forms(data: GoogleFormWebhook):
     }
 
 
-@app.post("/refine", response_model=RefineResponse)
+# ============================================================
+# JOBS ASSÍNCRONOS (resposta imediata + polling ou callback)
+# ============================================================
+
+async def _job_google_forms(payload: dict) -> dict:
+    return await _render_webhook(GoogleFormWebhook(**payload))
+
+
+async def _job_upload_pdf(payload: dict) -> dict:
+    try:
+        with spool_bytes(base64.b64decode(payload["pdf_base64"])) as pdf:
+            return await _process_pdf(pdf)
+    except HTTPException as e:
+        if e.status_code < 500:
+            raise PermanentJobError(e.detail)
+        raise
+
+
+job_workers.register("google_forms", _job_google_forms)
+job_workers.register("upload_pdf", _job_upload_pdf)
+
+
+async def _submit_job(kind: str, payload: dict, callback_url: Optional[str]) -> JobSubmitResponse:
+    """Valida o callback_url e grava o job (SQLite em thread, fora do event loop)."""
+    if callback_url:
+        try:
+            await check_callback_url(callback_url)
+        except InvalidCallbackError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    job_id = await asyncio.to_thread(job_queue.submit, kind, payload, callback_url)
+    return JobSubmitResponse(job_id=job_id, status="pending", status_url=f"/jobs/{job_id}")
+
+
+@app.post("/jobs/webhook/google-forms", response_model=JobSubmitResponse, status_code=202, dependencies=[Depends(rate_limit("webhook"))])
+async def submit_google_forms_job(data: GoogleFormWebhook, callback_url: Optional[str] = None):
+    """
+    Versão assíncrona do webhook: retorna o id do job na hora.
+    O resultado fica em GET /jobs/{id} e, se informado, é enviado via POST para callback_url
+    (http(s) e host público; endereços internos são recusados com 400).
+    """
+    return await _submit_job("google_forms", data.model_dump(), callback_url)
+
+
+@app.post("/jobs/upload-pdf", response_model=JobSubmitResponse, status_code=202, dependencies=[Depends(rate_limit("pdf"))])
+async def submit_upload_pdf_job(file: UploadFile = File(...), callback_url: Optional[str] = Form(None)):
+    """Versão assíncrona do /upload-pdf (mesmas validações de entrada)."""
+    with await spool_upload(file) as pdf:
+        payload = {"pdf_base64": base64.b64encode(pdf.read_bytes()).decode("ascii")}
+    return await _submit_job("upload_pdf", payload, callback_url)
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    return JobStatus(**job)
+
+
+@app.post("/refine", response_model=RefineResponse, dependencies=[Depends(rate_limit("refine"))])
 async def refine_prompt_endpoint(request: RefineRequest):
     """
     Refina um prompt existente usando IA (GPT-4).
@@ -214,11 +553,172 @@ async def refine_prompt_endpoint(request: RefineRequest):
         raise HTTPException(status_code=400, detail="Instrução não pode estar vazia")
 
     try:
-        prompt_refinado = await refine_prompt(request.prompt_atual, request.instrucao)
-        return RefineResponse(prompt_refinado=prompt_refinado)
+        with stage("refine"):
+            if request.modo == "secoes":
+                prompt_refinado, secoes_alteradas = await refine_prompt_sections(request.prompt_atual, request.instrucao)
+            else:
+                prompt_refinado, secoes_alteradas = await refine_prompt(request.prompt_atual, request.instrucao), None
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
+    except UpstreamBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
+    except ContextOverflowError as e:
+        # Recusado antes de chamar a IA; no modo "secoes" só as seções afetadas são enviadas
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao refinar prompt: {str(e)}")
 
+    await _save_refined(request, prompt_refinado)
+    return RefineResponse(prompt_refinado=prompt_refinado, secoes_alteradas=secoes_alteradas)
+
+
+async def _save_refined(request: RefineRequest, prompt_refinado: str) -> None:
+    if request.nome_empresa:
+        await _save_prompt(request.nome_empresa, request.team_id, prompt_refinado, "refine", instrucao=request.instrucao)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/refine/stream", dependencies=[Depends(rate_limit("refine"))])
+async def refine_prompt_stream_endpoint(request: RefineRequest):
+    """
+    Refina um prompt via Server-Sent Events.
+    Eventos: "delta" (trecho novo), "done" (texto completo) ou "error".
+    """
+    if not request.prompt_atual.strip():
+        raise HTTPException(status_code=400, detail="Prompt atual não pode estar vazio")
+
+    if not request.instrucao.strip():
+        raise HTTPException(status_code=400, detail="Instrução não pode estar vazia")
+
+    async def event_stream():
+        partes = []
+        try:
+            async for delta in refine_prompt_stream(request.prompt_atual, request.instrucao):
+                partes.append(delta)
+                yield _sse("delta", {"texto": delta})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Erro ao refinar prompt: {str(e)}"})
+            return
+        prompt_refinado = "".join(partes).strip()
+        await _save_refined(request, prompt_refinado)
+        yield _sse("done", {"prompt_refinado": prompt_refinado})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ============================================================
+# HISTÓRICO DE PROMPTS (exige API key de PROMPTS_API_KEYS; credenciais do Chatwoot mascaradas)
+# ============================================================
+
+# O rate limit vem antes da checagem da chave: tentativas de adivinhar também são limitadas
+PromptsScope = Annotated[Optional[str], Depends(require_prompts_key)]
+PROMPTS_DEPENDENCIES = [Depends(rate_limit("prompts"))]
+
+
+@app.get("/prompts", response_model=PaginaEmpresas, dependencies=PROMPTS_DEPENDENCIES)
+async def list_prompt_companies(escopo: PromptsScope, limit: int = 20, offset: int = 0):
+    """Empresas com prompt salvo, da atualização mais recente para a mais antiga."""
+    limit, offset = _pagination(limit, offset)
+    itens, total = await asyncio.to_thread(prompt_store.list_companies, limit, offset, team_id=escopo)
+    return PaginaEmpresas(total=total, limit=limit, offset=offset, itens=itens)
+
+
+@app.get("/prompts/{nome_empresa}", response_model=PaginaVersoes, dependencies=PROMPTS_DEPENDENCIES)
+async def list_prompt_versions(escopo: PromptsScope, nome_empresa: str, team_id: str = "1", limit: int = 20, offset: int = 0):
+    """Versões da empresa (sem o texto do prompt), da mais nova para a mais antiga."""
+    check_team_scope(escopo, team_id)
+    limit, offset = _pagination(limit, offset)
+    itens, total = await asyncio.to_thread(prompt_store.list_versions, nome_empresa, team_id, limit, offset)
+    return PaginaVersoes(total=total, limit=limit, offset=offset, itens=itens)
+
+
+@app.get("/prompts/{nome_empresa}/latest", response_model=PromptVersao, dependencies=PROMPTS_DEPENDENCIES)
+async def get_latest_prompt(escopo: PromptsScope, nome_empresa: str, team_id: str = "1"):
+    check_team_scope(escopo, team_id)
+    return _prompt_or_404(await asyncio.to_thread(prompt_store.get_version, nome_empresa, team_id))
+
+
+@app.get("/prompts/{nome_empresa}/{versao}", response_model=PromptVersao, dependencies=PROMPTS_DEPENDENCIES)
+async def get_prompt_version(escopo: PromptsScope, nome_empresa: str, versao: int, team_id: str = "1"):
+    check_team_scope(escopo, team_id)
+    return _prompt_or_404(await asyncio.to_thread(prompt_store.get_version, nome_empresa, team_id, versao))
+
+
+def _pagination(limit: int, offset: int) -> tuple[int, int]:
+    if not 1 <= limit <= 100 or offset < 0:
+        raise HTTPException(status_code=400, detail="Paginação inválida (limit entre 1 e 100, offset >= 0)")
+    return limit, offset
+
+
+def _prompt_or_404(versao: Optional[dict]) -> dict:
+    if versao is None:
+        raise HTTPException(status_code=404, detail="Prompt não encontrado")
+    return versao
+
+
+# ============================================================
+# CATÁLOGOS DE EQUIPAMENTOS (busca e paginação no servidor)
+# ============================================================
+
+@app.post("/catalog", response_model=CatalogoSalvo, dependencies=[Depends(rate_limit("catalog"))])
+async def save_catalog(catalogo: CatalogoEstruturado):
+    """
+    Salva um catálogo (ex.: editado no frontend) e retorna o id para busca,
+    paginação e para o catalog_id do /generate. O mesmo catálogo tem sempre o mesmo id.
+    """
+    categorias = catalogo.model_dump()["categorias"]
+    catalog_id = await asyncio.to_thread(catalog_store.save, categorias)
+    index = await _catalog_or_404(catalog_id)
+    return CatalogoSalvo(catalog_id=catalog_id, total_categorias=len(index.categorias), total_itens=index.total_itens)
+
+
+@app.get("/catalog/{catalog_id}/search", response_model=BuscaCatalogo)
+async def search_catalog(catalog_id: str, q: str, limit: int = 10):
+    """Autocomplete: itens e categorias cujos nomes têm palavras começando pelos termos (sem acentos)."""
+    limit, _ = _pagination(limit, 0)
+    index = await _catalog_or_404(catalog_id)
+    itens, total = index.search(q, limit)
+    return BuscaCatalogo(q=q, total=total, itens=itens)
+
+
+@app.get("/catalog/{catalog_id}/categorias", response_model=PaginaCategorias)
+async def list_catalog_categories(catalog_id: str, limit: int = 20, offset: int = 0):
+    """Categorias do catálogo, na ordem original, com seus itens."""
+    limit, offset = _pagination(limit, offset)
+    index = await _catalog_or_404(catalog_id)
+    return PaginaCategorias(total=len(index.categorias), limit=limit, offset=offset, itens=index.page(limit, offset))
+
+
+async def _catalog_or_404(catalog_id: str) -> CatalogIndex:
+    # Índice já montado neste processo: consulta direta; senão carrega e indexa fora do event loop
+    index = catalog_store.cached(catalog_id) or await asyncio.to_thread(catalog_store.get, catalog_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="Catálogo não encontrado")
+    return index
+
+
+@app.post("/templates/reload")
+async def reload_templates():
+    """Recarrega os templates do disco (apenas em desenvolvimento)."""
+    if not template_registry.auto_reload:
+        raise HTTPException(status_code=403, detail="Recarga de templates desabilitada em produção")
+
+    template_registry.reload()
+    return {"success": True, "templates": list(TEMPLATE_MAP)}
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métricas no formato texto do Prometheus."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 
 @app.get("/health")
 async def health_check():
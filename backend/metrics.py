@@ -0,0 +1,185 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+
+# ============================================================
+# MÉTRICAS (formato texto do Prometheus, sem dependências)
+# ============================================================
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# Liga o header Server-Timing nas respostas
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() in ("1", "true", "yes", "on")
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: Optional[tuple] = None) -> str:
+    pares = list(key) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pares) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v:g}" for k, v in self._values.items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [contagem por bucket..., soma, total]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            dados = self._values.get(key)
+            if dados is None:
+                dados = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            indice = bisect_left(self.buckets, value)
+            if indice < len(self.buckets):
+                dados[indice] += 1
+            dados[-2] += value
+            dados[-1] += 1
+
+    def count(self, **labels) -> int:
+        dados = self._values.get(_label_key(labels))
+        return dados[-1] if dados else 0
+
+    def render(self) -> list[str]:
+        linhas = []
+        with self._lock:
+            for key, dados in self._values.items():
+                acumulado = 0
+                for limite, qtd in zip(self.buckets, dados):
+                    acumulado += qtd
+                    linhas.append(f"{self.name}_bucket{_format_labels(key, ('le', f'{limite:g}'))} {acumulado}")
+                linhas.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {dados[-1]}")
+                linhas.append(f"{self.name}_sum{_format_labels(key)} {dados[-2]:g}")
+                linhas.append(f"{self.name}_count{_format_labels(key)} {dados[-1]}")
+        return linhas
+
+
+class CallbackMetric:
+    """Métrica lida na hora da coleta (ex.: contadores de cache de outros módulos)."""
+
+    def __init__(self, name: str, help: str, kind: str, fn: Callable[[], dict[tuple, float]]):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> list[str]:
+        return [f"{self.name}{_format_labels(k)} {v:g}" for k, v in self.fn().items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def callback(self, name: str, help: str, kind: str, fn: Callable[[], dict[tuple, float]]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, help, kind, fn))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        linhas = []
+        for metric in self._metrics:
+            linhas.append(f"# HELP {metric.name} {metric.help}")
+            linhas.append(f"# TYPE {metric.name} {metric.kind}")
+            linhas.extend(metric.render())
+        return "\n".join(linhas) + "\n"
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram("http_request_duration_seconds", "Duração das requisições HTTP por rota")
+STAGE_DURATION = registry.histogram("stage_duration_seconds", "Duração de cada etapa do processamento")
+LLM_CALLS = registry.counter("llm_calls_total", "Chamadas feitas à API da OpenAI")
+LLM_TOKENS = registry.counter("llm_tokens_total", "Tokens consumidos na API da OpenAI")
+FALLBACKS = registry.counter("fallbacks_total", "Falhas silenciosas em que os dados originais foram usados")
+
+
+# ============================================================
+# ETAPAS E SERVER-TIMING
+# ============================================================
+
+# Tempos das etapas da requisição atual, para o header Server-Timing
+_request_timings: ContextVar[Optional[list]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> list:
+    timings: list = []
+    _request_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(nome: str):
+    """Mede a duração de uma etapa (histograma + Server-Timing da requisição)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        STAGE_DURATION.observe(duracao, stage=nome)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((nome, duracao))
+
+
+def record_usage(operacao: str, response) -> None:
+    """Contabiliza tokens de prompt e de resposta a partir de response.usage."""
+    LLM_CALLS.inc(operation=operacao)
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, operation=operacao, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, operation=operacao, kind="completion")
+
+
+def server_timing_header(timings: list) -> str:
+    return ", ".join(f"{nome};dur={duracao * 1000:.1f}" for nome, duracao in timings)
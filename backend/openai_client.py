@@ -0,0 +1,183 @@
+import os
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+# ============================================================
+# CLIENTE OPENAI: POOL HTTP, RETRY COM BACKOFF E CIRCUIT BREAKER
+# ============================================================
+
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "20"))
+
+OPENAI_BREAKER_THRESHOLD = int(os.getenv("OPENAI_BREAKER_THRESHOLD", "5"))
+OPENAI_BREAKER_COOLDOWN = float(os.getenv("OPENAI_BREAKER_COOLDOWN", "30"))
+
+
+def _http2_available() -> bool:
+    # HTTP/2 no httpx depende do pacote opcional "h2"
+    if os.getenv("OPENAI_HTTP2", "1").lower() in ("0", "false", "no", "off"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_client(api_key: str) -> "AsyncOpenAI":
+    """
+    Cria o AsyncOpenAI sobre um httpx.AsyncClient compartilhado (keep-alive,
+    HTTP/2 quando disponível). Os retries do SDK ficam desligados: quem
+    controla é call_with_retry.
+    """
+    # Import tardio: o SDK da OpenAI é o módulo mais caro do cold start
+    import httpx
+    from openai import AsyncOpenAI
+
+    http_client = httpx.AsyncClient(
+        http2=_http2_available(),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=10.0),
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+
+
+class CircuitOpenError(Exception):
+    """A API está falhando seguidamente; chamadas recusadas até o fim do cooldown."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Serviço de IA indisponível, tente novamente em {retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """
+    Abre após `threshold` falhas transitórias seguidas. Depois do cooldown,
+    deixa passar uma chamada de teste (half-open): sucesso fecha, falha reabre.
+    """
+
+    def __init__(self, threshold: int = OPENAI_BREAKER_THRESHOLD, cooldown: float = OPENAI_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(self.cooldown - (time.monotonic() - self.opened_at))
+        if state == "half_open":
+            if self._trial_in_flight:
+                raise CircuitOpenError(1.0)
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Chamada cancelada: libera a vaga de teste sem contar sucesso nem falha."""
+        self._trial_in_flight = False
+
+
+breaker = CircuitBreaker()
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """429, 5xx, timeouts e falhas de conexão são transitórios."""
+    from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+    if isinstance(exc, (APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def retry_delay(attempt: int, exc: BaseException) -> float:
+    """Retry-After do servidor quando houver; senão backoff exponencial com full jitter."""
+    server_delay = _retry_after(exc)
+    if server_delay is not None:
+        return min(server_delay, OPENAI_BACKOFF_MAX)
+    return random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * (2 ** attempt)))
+
+
+async def call_with_retry(fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+    """Executa a chamada à API com retries para erros transitórios, passando pelo circuit breaker."""
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # Cliente desconectou no meio da chamada de teste: o próximo request testa de novo
+            breaker.release_trial()
+            raise
+        except Exception as exc:
+            if not is_retryable(exc):
+                # Erro do próprio request (400, 401...): a API está de pé
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt >= OPENAI_MAX_RETRIES or breaker.state == "open":
+                raise
+            await asyncio.sleep(retry_delay(attempt, exc))
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
@@ -0,0 +1,123 @@
+import os
+import mmap
+import asyncio
+from contextlib import contextmanager
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from catalog_chunker import PAGE_BREAK
+
+
+# ============================================================
+# EXTRAÇÃO PARALELA DE TEXTO DE PDF
+# ============================================================
+
+# Páginas por tarefa: abaixo disso o custo de abrir o PDF em outro processo não compensa
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+# Limite de caracteres por página: uma página patológica (ex.: tabela gigante) não infla a memória
+PDF_MAX_PAGE_CHARS = int(os.getenv("PDF_MAX_PAGE_CHARS", "20000"))
+
+_executor: Optional[Executor] = None
+
+
+def get_executor() -> Executor:
+    """
+    Pool de workers criado sob demanda. Usa processos (análise de layout é CPU-bound);
+    onde multiprocessing não está disponível (ex.: serverless sem /dev/shm)
+    ou PDF_EXECUTOR=thread, cai para threads.
+    """
+    global _executor
+    if _executor is None:
+        if os.getenv("PDF_EXECUTOR", "process") == "process":
+            try:
+                _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+            except (OSError, NotImplementedError):
+                _executor = None
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="pdf")
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+@contextmanager
+def _open_pdf(path: str):
+    # Arquivo mapeado em memória: as páginas são lidas do page cache do SO,
+    # compartilhado entre os workers, em vez de uma cópia do PDF por processo
+    import pdfplumber
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with pdfplumber.open(mapped) as pdf:
+            yield pdf
+
+
+def _count_pages(path: str) -> int:
+    with _open_pdf(path) as pdf:
+        return len(pdf.pages)
+
+
+def _page_text(page, max_chars: int) -> str:
+    """Texto e linhas de tabela da página, parando de acumular ao atingir max_chars."""
+    partes = []
+    total = 0
+    page_text = page.extract_text()
+    if page_text:
+        partes.append(page_text[:max_chars])
+        total = len(partes[0]) + 1
+
+    if total < max_chars:
+        for table in page.extract_tables():
+            for row in table:
+                if total >= max_chars:
+                    break
+                linha = " | ".join(cell or "" for cell in row)[:max_chars - total]
+                partes.append(linha)
+                total += len(linha) + 1
+
+    return "".join(parte + "\n" for parte in partes)
+
+
+def _extract_range(path: str, start: int, end: int) -> str:
+    """Extrai texto e tabelas das páginas [start, end). Roda dentro do worker."""
+    paginas = []
+    with _open_pdf(path) as pdf:
+        for page in pdf.pages[start:end]:
+            paginas.append(_page_text(page, PDF_MAX_PAGE_CHARS))
+            # Libera objetos de layout da página já processada
+            page.flush_cache()
+
+    # Cada página termina com \f para que o texto possa ser dividido por página depois
+    return "".join(pagina + PAGE_BREAK for pagina in paginas)
+
+
+def _page_ranges(total_pages: int) -> list[tuple[int, int]]:
+    # Divide em até PDF_WORKERS faixas, com no mínimo PAGES_PER_TASK páginas cada
+    workers = max(1, min(PDF_WORKERS, -(-total_pages // PAGES_PER_TASK)))
+    tamanho = -(-total_pages // workers)
+    return [(inicio, min(inicio + tamanho, total_pages)) for inicio in range(0, total_pages, tamanho)]
+
+
+async def extract_pdf_text(path: str) -> str:
+    """
+    Extrai o texto do PDF em `path` fora do event loop, distribuindo faixas de
+    páginas entre os workers (cada um abre o arquivo) e juntando os resultados
+    na ordem original.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+
+    total_pages = await loop.run_in_executor(executor, _count_pages, path)
+    if total_pages == 0:
+        return ""
+
+    partes = await asyncio.gather(*(
+        loop.run_in_executor(executor, _extract_range, path, inicio, fim)
+        for inicio, fim in _page_ranges(total_pages)
+    ))
+    return "".join(partes)
@@ -0,0 +1,156 @@
+import os
+import hashlib
+import tempfile
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import Message, Receive, Scope, Send
+
+
+# ============================================================
+# RECEBIMENTO DE PDF EM STREAM (MEMÓRIA CONSTANTE POR UPLOAD)
+# ============================================================
+
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(4 * 1024 * 1024)))
+PDF_SPOOL_DIR = os.getenv("PDF_SPOOL_DIR") or None
+CHUNK_SIZE = 64 * 1024
+
+# O cabeçalho %PDF- pode vir depois de até 1024 bytes de lixo (tolerado pelos leitores)
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+
+# Folga para boundaries e campos do multipart (ex.: callback_url) além do arquivo
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Arquivo muito grande (máx {max_bytes // (1024 * 1024)}MB)")
+
+
+def _not_pdf() -> HTTPException:
+    return HTTPException(status_code=400, detail="Apenas arquivos PDF são aceitos")
+
+
+class SpooledPdf:
+    """
+    PDF recebido gravado em arquivo temporário, com tamanho e SHA-256
+    calculados durante a gravação. Remove o arquivo ao sair do `with`.
+    """
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def close(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SpooledPdf":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _Spooler:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.digest = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=PDF_SPOOL_DIR)
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        if not self.size and PDF_MAGIC not in chunk[:PDF_MAGIC_WINDOW]:
+            raise _not_pdf()
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise _too_large(self.max_bytes)
+        self.digest.update(chunk)
+        self.file.write(chunk)
+
+    def finish(self) -> SpooledPdf:
+        self.file.close()
+        if not self.size:
+            raise _not_pdf()
+        return SpooledPdf(self.path, self.size, self.digest.hexdigest())
+
+    def abort(self) -> None:
+        self.file.close()
+        os.unlink(self.path)
+
+
+async def spool_upload(file: UploadFile, max_bytes: int = PDF_MAX_BYTES) -> SpooledPdf:
+    """
+    Lê o upload em blocos para um arquivo temporário: confere o %PDF no primeiro
+    bloco e interrompe assim que passar de `max_bytes`, sem manter o arquivo em memória.
+    """
+    spooler = _Spooler(max_bytes)
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            spooler.write(chunk)
+        return spooler.finish()
+    except BaseException:
+        spooler.abort()
+        raise
+
+
+def spool_bytes(contents: bytes, max_bytes: int = PDF_MAX_BYTES) -> SpooledPdf:
+    """Mesmo resultado de spool_upload para um PDF já em memória (jobs)."""
+    spooler = _Spooler(max_bytes)
+    try:
+        for inicio in range(0, len(contents), CHUNK_SIZE):
+            spooler.write(contents[inicio:inicio + CHUNK_SIZE])
+        return spooler.finish()
+    except BaseException:
+        spooler.abort()
+        raise
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Recusa com 413 os uploads acima do limite antes de o parser de multipart
+    gravar o corpo: pelo Content-Length declarado, na hora, ou contando os bytes
+    recebidos (uploads chunked, sem Content-Length) e interrompendo a leitura.
+    """
+
+    def __init__(self, app, paths: tuple[str, ...], max_bytes: Optional[int] = None):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = PDF_MAX_BYTES if max_bytes is None else max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        limite = self.max_bytes + MULTIPART_OVERHEAD
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > limite:
+            erro = _too_large(self.max_bytes)
+            response = JSONResponse({"detail": erro.detail}, status_code=erro.status_code, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        recebidos = 0
+
+        async def receive_limited() -> Message:
+            nonlocal recebidos
+            message = await receive()
+            if message["type"] == "http.request":
+                recebidos += len(message.get("body", b""))
+                if recebidos > limite:
+                    # HTTPException atravessa o parser do corpo do FastAPI e vira a resposta 413
+                    raise _too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, receive_limited, send)
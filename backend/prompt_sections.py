@@ -0,0 +1,156 @@
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from catalog_chunker import normalize_name
+
+
+# ============================================================
+# SEÇÕES NUMERADAS DO PROMPT (## N) Título)
+# ============================================================
+
+SECTION_HEADING = re.compile(r"^## (\d+)\) (.*)$", re.MULTILINE)
+
+# Palavras de título curtas/genéricas demais para indicar a seção sozinhas
+_MIN_TITLE_WORD = 6
+
+
+@dataclass
+class Section:
+    numero: int
+    titulo: str
+    texto: str  # seção completa, do cabeçalho até antes da próxima seção
+
+
+class SectionPatchError(ValueError):
+    """O patch devolvido pela IA não pode ser aplicado com segurança."""
+
+
+def parse_sections(prompt: str) -> tuple[str, list[Section]]:
+    """
+    Divide o prompt em preâmbulo + seções. A concatenação de preâmbulo e
+    textos das seções reproduz o prompt original byte a byte.
+    """
+    matches = list(SECTION_HEADING.finditer(prompt))
+    if not matches:
+        return prompt, []
+
+    preambulo = prompt[:matches[0].start()]
+    secoes = []
+    for i, match in enumerate(matches):
+        fim = matches[i + 1].start() if i + 1 < len(matches) else len(prompt)
+        secoes.append(Section(int(match.group(1)), match.group(2).strip(), prompt[match.start():fim]))
+    return preambulo, secoes
+
+
+def outline(secoes: list[Section]) -> str:
+    return "\n".join(f"## {s.numero}) {s.titulo}" for s in secoes)
+
+
+def select_sections(secoes: list[Section], instrucao: str) -> list[Section]:
+    """
+    Seções citadas explicitamente pela instrução: por número ("seção 7", "7)")
+    ou por uma palavra distintiva do título ("objeções"). Lista vazia = indefinido.
+    """
+    numeros = set()
+    for por_nome, por_parentese in re.findall(r"(?:se[cç][aã]o|item|##)\s*(\d+)|\b(\d+)\)", instrucao, re.IGNORECASE):
+        numeros.add(int(por_nome or por_parentese))
+    palavras = set(normalize_name(instrucao).split())
+
+    selecionadas = []
+    for secao in secoes:
+        titulo = {p for p in normalize_name(secao.titulo).split() if len(p) >= _MIN_TITLE_WORD}
+        if secao.numero in numeros or titulo & palavras:
+            selecionadas.append(secao)
+    return selecionadas
+
+
+def _ensure_newline(texto: str, modelo: str) -> str:
+    # Mantém o mesmo final de linha da seção original (evita colar seções)
+    sufixo = modelo[len(modelo.rstrip("\n")):]
+    return texto.rstrip("\n") + (sufixo or "\n")
+
+
+def _check_single_section(conteudo: str, rotulo: str) -> None:
+    # O conteúdo tem que ser exatamente uma seção: cabeçalhos a mais seriam enxertados no prompt
+    preambulo, secoes = parse_sections(conteudo.lstrip())
+    if preambulo or len(secoes) != 1:
+        raise SectionPatchError(f"{rotulo} deve conter exatamente um cabeçalho '## N) Título'")
+
+
+def _renumber(texto: str, numero: int) -> str:
+    return SECTION_HEADING.sub(lambda m: f"## {numero}) {m.group(2)}", texto, count=1)
+
+
+def apply_patch(prompt: str, patch: dict, permitidas: Optional[set[int]] = None) -> tuple[str, list[int]]:
+    """
+    Aplica {"secoes": [{"numero", "conteudo"}], "novas_secoes": [{"apos", "conteudo"}]}
+    ao prompt e valida que as seções não tocadas continuam idênticas.
+    Seções inseridas recebem o número seguinte ao da anterior e as seções
+    depois delas são renumeradas (o número vindo da IA é ignorado).
+    Retorna o novo prompt e os números (já renumerados) das seções alteradas/inseridas.
+    """
+    preambulo, secoes = parse_sections(prompt)
+    por_numero = {s.numero: s for s in secoes}
+    if len(por_numero) < len(secoes):
+        # Com números repetidos não dá para saber qual seção o patch quer trocar
+        raise SectionPatchError("Prompt com números de seção repetidos")
+    novos_textos = {s.numero: s.texto for s in secoes}
+    inserir: dict[int, list[str]] = {}
+    editadas: set[int] = set()
+
+    for item in patch.get("secoes") or []:
+        numero = item.get("numero")
+        conteudo = item.get("conteudo")
+        if numero not in por_numero or not isinstance(conteudo, str) or not conteudo.strip():
+            raise SectionPatchError(f"Seção inválida no patch: {numero}")
+        if permitidas is not None and numero not in permitidas:
+            raise SectionPatchError(f"Seção {numero} não foi enviada para edição")
+        _check_single_section(conteudo, f"Seção {numero}")
+        novos_textos[numero] = _ensure_newline(conteudo.lstrip(), por_numero[numero].texto)
+        editadas.add(numero)
+
+    for item in patch.get("novas_secoes") or []:
+        apos = item.get("apos")
+        conteudo = item.get("conteudo")
+        if apos not in por_numero or not isinstance(conteudo, str):
+            raise SectionPatchError(f"Nova seção inválida após {apos}")
+        _check_single_section(conteudo, f"Nova seção após {apos}")
+        inserir.setdefault(apos, []).append(conteudo.lstrip())
+
+    partes = [preambulo]
+    alteradas: list[int] = []
+    intactas: list[str] = []  # textos originais (renumerados) que devem reaparecer iguais
+    esperados: list[int] = []
+    deslocamento = 0
+    for secao in secoes:
+        numero = secao.numero + deslocamento
+        esperados.append(numero)
+        partes.append(_renumber(novos_textos[secao.numero], numero))
+        if secao.numero in editadas:
+            alteradas.append(numero)
+        else:
+            intactas.append(_renumber(secao.texto, numero))
+        for conteudo in inserir.get(secao.numero, []):
+            deslocamento += 1
+            numero += 1
+            if not partes[-1].endswith("\n\n"):
+                partes[-1] = partes[-1].rstrip("\n") + "\n\n"
+            partes.append(_renumber(_ensure_newline(conteudo, "\n\n"), numero))
+            esperados.append(numero)
+            alteradas.append(numero)
+    resultado = "".join(partes)
+
+    # Validação: tudo que não foi alterado precisa estar byte a byte igual
+    # (exceto o número e a linha em branco antes de uma seção inserida)
+    _, secoes_novas = parse_sections(resultado)
+    if [s.numero for s in secoes_novas] != list(esperados):
+        raise SectionPatchError("Número ou ordem das seções diferente do esperado após o patch")
+    textos_resultado = {s.texto.rstrip("\n") for s in secoes_novas}
+    for texto in intactas:
+        if texto.rstrip("\n") not in textos_resultado:
+            raise SectionPatchError(f"Seção {texto.splitlines()[0]!r} foi modificada sem autorização")
+    if not resultado.startswith(preambulo):
+        raise SectionPatchError("Preâmbulo do prompt foi modificado")
+
+    return resultado, alteradas
@@ -0,0 +1,258 @@
+import os
+import re
+import json
+import time
+import hashlib
+import stat
+import sqlite3
+import tempfile
+import threading
+from typing import Optional, Union
+
+from catalog_chunker import normalize_name
+
+
+# ============================================================
+# ARMAZENAMENTO DE PROMPTS COM VERSIONAMENTO
+# ============================================================
+
+class PromptStore:
+    """
+    Interface do armazenamento. Cada empresa (nome normalizado + team_id) tem
+    um histórico de versões; salvar o mesmo conteúdo da versão atual não cria outra.
+    """
+
+    def save(
+        self,
+        nome_empresa: str,
+        team_id: str,
+        prompt: str,
+        origem: str,
+        template_type: Optional[str] = None,
+        briefing: Optional[Union[dict, str]] = None,
+        instrucao: Optional[str] = None,
+    ) -> dict:
+        """`briefing` pode vir como dict ou já serializado em JSON (ex.: model_dump_json)."""
+        raise NotImplementedError
+
+    def list_companies(self, limit: int = 20, offset: int = 0, team_id: Optional[str] = None) -> tuple[list[dict], int]:
+        """Empresas de todos os times, ou só do team_id informado."""
+        raise NotImplementedError
+
+    def list_versions(self, nome_empresa: str, team_id: str, limit: int = 20, offset: int = 0) -> tuple[list[dict], int]:
+        raise NotImplementedError
+
+    def get_version(self, nome_empresa: str, team_id: str, versao: Optional[int] = None) -> Optional[dict]:
+        """Versão específica, ou a mais recente se versao for None."""
+        raise NotImplementedError
+
+
+class NullPromptStore(PromptStore):
+    """Armazenamento desligado (PROMPT_STORE_BACKEND=off)."""
+
+    def save(self, *args, **kwargs) -> dict:
+        return {}
+
+    def list_companies(self, limit=20, offset=0, team_id=None):
+        return [], 0
+
+    def list_versions(self, nome_empresa, team_id, limit=20, offset=0):
+        return [], 0
+
+    def get_version(self, nome_empresa, team_id, versao=None):
+        return None
+
+
+def content_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+# Credenciais do Chatwoot: ficam no prompt entregue a quem gerou, nunca nas leituras do histórico
+SECRET_FIELDS = ("apikey_chatwoot", "url_chatwoot")
+_SECRET_LINE = re.compile(r'(\b(?:%s) = ")[^"]*(")' % "|".join(SECRET_FIELDS))
+
+
+def redact_secrets(dados: dict) -> dict:
+    """Mascara as credenciais no prompt e no briefing. Aplicada ao gravar e, para linhas antigas, ao ler."""
+    if dados.get("prompt"):
+        dados["prompt"] = _SECRET_LINE.sub(r"\1***\2", dados["prompt"])
+    if isinstance(dados.get("briefing"), dict):
+        for campo in SECRET_FIELDS:
+            if dados["briefing"].get(campo):
+                dados["briefing"][campo] = "***"
+    return dados
+
+
+class SQLitePromptStore(PromptStore):
+    """SQLite em modo WAL: leituras não bloqueiam escritas, consultas por índice."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = None
+        # Só o dono lê o histórico (o SQLite cria -wal/-shm com as mesmas permissões)
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        os.chmod(path, 0o600)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS prompt_versions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                empresa_key TEXT NOT NULL,
+                nome_empresa TEXT NOT NULL,
+                team_id TEXT NOT NULL,
+                versao INTEGER NOT NULL,
+                origem TEXT NOT NULL,
+                template_type TEXT,
+                content_hash TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                briefing TEXT,
+                instrucao TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_prompt_versao ON prompt_versions(empresa_key, team_id, versao);
+            -- A mesma versão pode voltar depois (A -> B -> A): o hash só é único frente à última versão
+            DROP INDEX IF EXISTS idx_prompt_hash;
+            CREATE INDEX IF NOT EXISTS idx_prompt_recentes ON prompt_versions(created_at);
+            """
+        )
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Conexão SQLite não sobrevive a fork (gunicorn com preload): cada processo abre a sua
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("PRAGMA busy_timeout=5000")
+            self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def _row(row: sqlite3.Row, com_conteudo: bool = True) -> dict:
+        dados = dict(row)
+        dados.pop("empresa_key", None)
+        if com_conteudo:
+            dados["briefing"] = json.loads(dados["briefing"]) if dados.get("briefing") else None
+            redact_secrets(dados)
+        else:
+            dados.pop("prompt", None)
+            dados.pop("briefing", None)
+        return dados
+
+    def save(self, nome_empresa, team_id, prompt, origem, template_type=None, briefing=None, instrucao=None) -> dict:
+        empresa_key = normalize_name(nome_empresa) or "empresa"
+        # As credenciais do Chatwoot nunca chegam ao disco
+        if isinstance(briefing, str):
+            briefing = json.loads(briefing)
+        registro = redact_secrets({"prompt": prompt, "briefing": dict(briefing) if briefing is not None else None})
+        prompt = registro["prompt"]
+        briefing = json.dumps(registro["briefing"], ensure_ascii=False) if registro["briefing"] is not None else None
+        hash_ = content_hash(prompt)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                ultima = self._conn.execute(
+                    """SELECT versao, content_hash FROM prompt_versions WHERE empresa_key = ? AND team_id = ?
+                       ORDER BY versao DESC LIMIT 1""",
+                    (empresa_key, team_id),
+                ).fetchone()
+                # Só não duplica se for igual à versão atual; voltar a um conteúdo antigo cria nova versão
+                if ultima is not None and ultima["content_hash"] == hash_:
+                    self._conn.execute("COMMIT")
+                    return {"versao": ultima["versao"], "content_hash": hash_, "nova": False}
+
+                versao = ultima["versao"] + 1 if ultima is not None else 1
+                self._conn.execute(
+                    """INSERT INTO prompt_versions
+                       (empresa_key, nome_empresa, team_id, versao, origem, template_type, content_hash,
+                        prompt, briefing, instrucao, created_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        empresa_key, nome_empresa, team_id, versao, origem, template_type, hash_, prompt,
+                        briefing, instrucao, time.time(),
+                    ),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"versao": versao, "content_hash": hash_, "nova": True}
+
+    def list_companies(self, limit=20, offset=0, team_id=None):
+        # team_id None = todos os times (a condição "? IS NULL" desliga o filtro)
+        with self._lock:
+            total = self._conn.execute(
+                """SELECT COUNT(*) FROM (SELECT 1 FROM prompt_versions WHERE ? IS NULL OR team_id = ?
+                   GROUP BY empresa_key, team_id)""",
+                (team_id, team_id),
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                """SELECT nome_empresa, team_id, versao AS ultima_versao, created_at AS atualizado_em
+                   FROM prompt_versions p
+                   WHERE (? IS NULL OR team_id = ?)
+                     AND versao = (SELECT MAX(versao) FROM prompt_versions
+                                   WHERE empresa_key = p.empresa_key AND team_id = p.team_id)
+                   ORDER BY created_at DESC LIMIT ? OFFSET ?""",
+                (team_id, team_id, limit, offset),
+            ).fetchall()
+        return [dict(r) for r in rows], total
+
+    def list_versions(self, nome_empresa, team_id, limit=20, offset=0):
+        empresa_key = normalize_name(nome_empresa) or "empresa"
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM prompt_versions WHERE empresa_key = ? AND team_id = ?",
+                (empresa_key, team_id),
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                """SELECT * FROM prompt_versions WHERE empresa_key = ? AND team_id = ?
+                   ORDER BY versao DESC LIMIT ? OFFSET ?""",
+                (empresa_key, team_id, limit, offset),
+            ).fetchall()
+        return [self._row(r, com_conteudo=False) for r in rows], total
+
+    def get_version(self, nome_empresa, team_id, versao=None):
+        empresa_key = normalize_name(nome_empresa) or "empresa"
+        with self._lock:
+            if versao is None:
+                row = self._conn.execute(
+                    """SELECT * FROM prompt_versions WHERE empresa_key = ? AND team_id = ?
+                       ORDER BY versao DESC LIMIT 1""",
+                    (empresa_key, team_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT * FROM prompt_versions WHERE empresa_key = ? AND team_id = ? AND versao = ?",
+                    (empresa_key, team_id, versao),
+                ).fetchone()
+        return self._row(row) if row is not None else None
+
+
+def _private_dir() -> str:
+    """
+    Diretório do usuário atual dentro do diretório temporário (0700, dono
+    conferido): outro usuário da máquina não lê nem planta o banco.
+    """
+    if not hasattr(os, "getuid"):
+        return tempfile.gettempdir()
+    path = os.path.join(tempfile.gettempdir(), f"gerador-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"{path} não é um diretório privado deste usuário; defina PROMPT_STORE_PATH")
+    return path
+
+
+def build_prompt_store() -> PromptStore:
+    """
+    PROMPT_STORE_BACKEND = sqlite (padrão) | off
+    PROMPT_STORE_PATH    = arquivo SQLite (padrão: diretório privado do usuário no diretório temporário)
+    """
+    if os.getenv("PROMPT_STORE_BACKEND", "sqlite").lower() == "off":
+        return NullPromptStore()
+    path = os.getenv("PROMPT_STORE_PATH") or os.path.join(_private_dir(), "prompts.sqlite3")
+    return SQLitePromptStore(path)
@@ -0,0 +1,310 @@
+import os
+import time
+import asyncio
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from starlette.types import Receive, Scope, Send
+
+from auth import request_api_key
+from metrics import registry
+
+
+# ============================================================
+# RATE LIMIT (TOKEN BUCKET) E LIMITES DE CONCORRÊNCIA
+# ============================================================
+
+RATE_LIMITED = registry.counter("rate_limited_total", "Requisições recusadas com 429 por limite e escopo")
+
+
+@dataclass(frozen=True)
+class Limit:
+    """`requests` requisições a cada `per_seconds`, com rajada de até `requests`."""
+
+    requests: int
+    per_seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.per_seconds
+
+    @classmethod
+    def parse(cls, texto: str) -> "Limit":
+        # "20/60" = 20 requisições por minuto
+        requests, _, per_seconds = texto.partition("/")
+        return cls(int(requests), float(per_seconds or 60))
+
+
+# Limites padrão por grupo de endpoints; RATE_LIMIT_<GRUPO>=N/S sobrescreve (ex.: RATE_LIMIT_REFINE=10/60)
+DEFAULT_LIMITS = {
+    "generate": "60/60",
+    "batch": "5/60",
+    "webhook": "60/60",
+    "refine": "20/60",
+    "pdf": "10/60",
+    "catalog": "30/60",
+    "prompts": "60/60",
+}
+# Requisições simultâneas por cliente (em cada processo)
+RATE_LIMIT_CONCURRENCY = int(os.getenv("RATE_LIMIT_CONCURRENCY", "4"))
+
+
+def get_limit(grupo: str) -> Limit:
+    return Limit.parse(os.getenv(f"RATE_LIMIT_{grupo.upper()}", DEFAULT_LIMITS[grupo]))
+
+
+class RateLimitStore:
+    """Interface dos buckets: consome `cost` fichas e diz quanto esperar se não houver."""
+
+    def consume(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        """Retorna 0 se liberado, ou os segundos até haver fichas suficientes."""
+        raise NotImplementedError
+
+
+def _refill(tokens: float, updated: float, now: float, limit: Limit) -> float:
+    return min(float(limit.requests), tokens + (now - updated) * limit.rate)
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Buckets em memória do processo (um worker)."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, limit, cost=1.0):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(limit.requests), now))
+            tokens = _refill(tokens, updated, now, limit)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                espera = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                espera = (cost - tokens) / limit.rate
+            if len(self._buckets) > self.max_keys:
+                self._evict_full(now, limit)
+        return espera
+
+    def _evict_full(self, now: float, limit: Limit) -> None:
+        # Buckets cheios equivalem a buckets inexistentes
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if _refill(tokens, updated, now, limit) >= limit.requests:
+                del self._buckets[key]
+
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """
+    Buckets em SQLite: compartilhados entre os workers do gunicorn na mesma
+    máquina (o papel que um Redis local faria), sem dependência externa.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Conexão SQLite não sobrevive a fork (gunicorn com preload): cada processo abre a sua
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=OFF")
+            self._connection.execute("PRAGMA busy_timeout=2000")
+            self._pid = os.getpid()
+        return self._connection
+
+    def consume(self, key, limit, cost=1.0):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = _refill(*row, now, limit) if row else float(limit.requests)
+                espera = 0.0 if tokens >= cost else (cost - tokens) / limit.rate
+                if not espera:
+                    tokens -= cost
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return espera
+
+
+def build_rate_limit_store() -> Optional[RateLimitStore]:
+    """
+    RATE_LIMIT_BACKEND = memory (padrão, por worker) | sqlite (compartilhado entre workers) | off
+    RATE_LIMIT_PATH    = arquivo SQLite (padrão: diretório temporário)
+    """
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "off":
+        return None
+    if backend == "sqlite":
+        path = os.getenv("RATE_LIMIT_PATH") or os.path.join(tempfile.gettempdir(), "gerador_rate_limit.sqlite3")
+        return SQLiteRateLimitStore(path)
+    return MemoryRateLimitStore()
+
+
+store = build_rate_limit_store()
+
+
+def client_key(request: Request) -> str:
+    """Identifica o cliente pela API key (se enviada) ou pelo IP."""
+    api_key = request_api_key(request)
+    if api_key:
+        # Nunca guarda a chave em si
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return "ip:" + (request.client.host if request.client else "desconhecido")
+
+
+def _team_id(request: Request) -> Optional[str]:
+    """
+    team_id do header X-Team-Id ou da query string. O corpo não é lido aqui:
+    seria parseado duas vezes (aqui e na validação do endpoint).
+    """
+    return request.headers.get("x-team-id") or request.query_params.get("team_id")
+
+
+# "1" é o valor padrão dos formulários, não identifica um cliente
+DEFAULT_TEAM_ID = "1"
+
+
+def _too_many(grupo: str, escopo: str, retry_after: float, detail: str) -> HTTPException:
+    RATE_LIMITED.inc(group=grupo, scope=escopo)
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(int(retry_after) + 1)})
+
+
+_in_flight: dict[str, int] = {}
+
+# Lista, no scope da requisição, dos clientes cujas vagas de concorrência ela ocupa
+_SLOTS_SCOPE_KEY = "rate_limit.slots"
+
+
+def _release(cliente: str) -> None:
+    _in_flight[cliente] -= 1
+    if not _in_flight[cliente]:
+        del _in_flight[cliente]
+
+
+class ConcurrencySlotMiddleware:
+    """
+    Devolve as vagas de concorrência tomadas por rate_limit só quando a resposta
+    termina de ser enviada. O corpo de um StreamingResponse (/refine/stream,
+    /generate/batch com stream) roda depois das dependências do endpoint, então
+    liberar a vaga na dependência deixaria streams ilimitados por cliente.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        slots = scope[_SLOTS_SCOPE_KEY] = []
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            for cliente in slots:
+                _release(cliente)
+
+
+def rate_limit(grupo: str):
+    """
+    Dependência FastAPI: aplica o token bucket do grupo ao cliente e ao team_id
+    (header X-Team-Id ou query string) e limita as requisições simultâneas do
+    cliente até o fim da resposta (exige o ConcurrencySlotMiddleware no app).
+    Estourou: 429 com Retry-After.
+    """
+    limit = get_limit(grupo)
+
+    async def dependency(request: Request) -> None:
+        if store is None:
+            return
+
+        cliente = client_key(request)
+        chaves = [("cliente", f"{grupo}:{cliente}")]
+        team_id = _team_id(request)
+        if team_id and team_id != DEFAULT_TEAM_ID:
+            chaves.append(("team", f"{grupo}:team:{team_id}"))
+        for escopo, chave in chaves:
+            if isinstance(store, SQLiteRateLimitStore):
+                # BEGIN IMMEDIATE pode esperar o busy_timeout: em thread, fora do event loop
+                espera = await asyncio.to_thread(store.consume, chave, limit)
+            else:
+                espera = store.consume(chave, limit)
+            if espera:
+                raise _too_many(grupo, escopo, espera, "Muitas requisições. Aguarde e tente novamente.")
+
+        slots = request.scope.get(_SLOTS_SCOPE_KEY)
+        if slots is None:
+            raise RuntimeError("rate_limit exige o ConcurrencySlotMiddleware registrado no app")
+        if _in_flight.get(cliente, 0) >= RATE_LIMIT_CONCURRENCY:
+            raise _too_many(grupo, "concorrencia", 1, "Muitas requisições simultâneas deste cliente.")
+        _in_flight[cliente] = _in_flight.get(cliente, 0) + 1
+        slots.append(cliente)
+
+    return dependency
+
+
+# ============================================================
+# LIMITE GLOBAL DE CHAMADAS SIMULTÂNEAS À OPENAI
+# ============================================================
+
+class UpstreamBusyError(Exception):
+    """Todas as vagas de chamada à OpenAI ficaram ocupadas além do tempo de espera."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__("Serviço de IA sobrecarregado, tente novamente em instantes")
+
+
+class UpstreamLimiter:
+    """
+    Semáforo global (por processo) das chamadas à OpenAI: protege o rate limit
+    da conta de todos os clientes. Quem espera mais que `queue_timeout` desiste.
+    """
+
+    def __init__(self, max_concurrency: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            RATE_LIMITED.inc(group="llm", scope="global")
+            raise UpstreamBusyError(self.queue_timeout)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+llm_limiter = UpstreamLimiter(
+    int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+    float(os.getenv("LLM_QUEUE_TIMEOUT", "15")),
+)
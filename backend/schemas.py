@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from pydantic import BaseModel, Discriminator, Field, Tag
+from typing import Annotated, Optional, Literal, Union
 
 
 class Produto(BaseModel):
@@ -12,6 +12,48 @@ class CategoriaEquipamento(BaseModel):
     itens: list[str] = Field(default_factory=list)
 
 
+class CatalogoEstruturado(BaseModel):
+    """Saída estruturada da IA ao organizar um catálogo de PDF."""
+
+    categorias: list[CategoriaEquipamento] = Field(default_factory=list)
+
+
+class BriefingProcessado(BaseModel):
+    """Saída estruturada do pré-processamento do briefing (campos interpretados pela IA)."""
+
+    mensagem_boas_vindas: Optional[str] = None
+    endereco: Optional[str] = None
+    horario_funcionamento: Optional[str] = None
+    regra_preco_texto: Optional[str] = None
+    texto_objecoes: Optional[str] = None
+    texto_duvida_tecnica: Optional[str] = None
+    produtos_catalogo: list[Produto] = Field(default_factory=list)
+    frase_autoridade: Optional[str] = None
+    proibicoes_texto: Optional[str] = None
+    nome_empresa: Optional[str] = None
+    nome_atendente: Optional[str] = None
+    menu_opcoes: list[str] = Field(default_factory=list)
+    opcoes_transbordo_imediato: Optional[str] = None
+
+
+class SecaoAlterada(BaseModel):
+    numero: int
+    conteudo: str
+
+
+class NovaSecao(BaseModel):
+    apos: int
+    conteudo: str
+
+
+class PatchSecoes(BaseModel):
+    """Saída estruturada do refinamento por seção."""
+
+    secoes: list[SecaoAlterada] = Field(default_factory=list)
+    novas_secoes: list[NovaSecao] = Field(default_factory=list)
+    precisa_prompt_completo: bool = False
+
+
 class PromptRequest(BaseModel):
     """Todos os campos são opcionais com valores padrão."""
 
@@ -79,13 +121,130 @@ class PromptResponse(BaseModel):
     prompt: str
 
 
+class BatchGenerateRequest(BaseModel):
+    """Lote de payloads de /generate (PromptRequest ou LocadoraPromptRequest)."""
+
+    itens: list[dict] = Field(default_factory=list)
+    concorrencia: Optional[int] = None
+    timeout_item: Optional[float] = None
+    stream: bool = False
+
+
+class BatchItemResult(BaseModel):
+    indice: int
+    success: bool
+    prompt: Optional[str] = None
+    erro: Optional[str] = None
+
+
+class BatchGenerateResponse(BaseModel):
+    total: int
+    sucesso: int
+    falhas: int
+    resultados: list[BatchItemResult]
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: Literal["pending", "running", "done", "failed"]
+    attempts: int
+    max_attempts: int
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    expires_at: Optional[float] = None
+
+
+class PromptEmpresaResumo(BaseModel):
+    nome_empresa: str
+    team_id: str
+    ultima_versao: int
+    atualizado_em: float
+
+
+class PromptVersaoResumo(BaseModel):
+    id: int
+    nome_empresa: str
+    team_id: str
+    versao: int
+    origem: Literal["generate", "webhook", "refine"]
+    template_type: Optional[str] = None
+    content_hash: str
+    instrucao: Optional[str] = None
+    created_at: float
+
+
+class PromptVersao(PromptVersaoResumo):
+    prompt: str
+    briefing: Optional[dict] = None
+
+
+class PaginaEmpresas(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    itens: list[PromptEmpresaResumo]
+
+
+class PaginaVersoes(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    itens: list[PromptVersaoResumo]
+
+
+class CatalogoSalvo(BaseModel):
+    catalog_id: str
+    total_categorias: int
+    total_itens: int
+
+
+class ResultadoBuscaCatalogo(BaseModel):
+    indice_categoria: int
+    categoria: str
+    # None quando o resultado é a própria categoria
+    item: Optional[str] = None
+
+
+class BuscaCatalogo(BaseModel):
+    q: str
+    total: int
+    itens: list[ResultadoBuscaCatalogo]
+
+
+class CategoriaCatalogo(CategoriaEquipamento):
+    indice: int
+    total_itens: int
+
+
+class PaginaCategorias(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    itens: list[CategoriaCatalogo]
+
+
 class RefineRequest(BaseModel):
     prompt_atual: str
     instrucao: str
+    # "secoes": a IA reescreve só as seções afetadas (## N)) e o restante é preservado
+    modo: Literal["completo", "secoes"] = "completo"
+    # Se informados, o prompt refinado é salvo como nova versão da empresa
+    nome_empresa: Optional[str] = None
+    team_id: str = "1"
 
 
 class RefineResponse(BaseModel):
     prompt_refinado: str
+    secoes_alteradas: Optional[list[int]] = None
 
 
 class GoogleFormWebhook(BaseModel):
@@ -129,6 +288,28 @@ class GoogleFormWebhook(BaseModel):
     itens_adicionais: Optional[str] = None
     email_destino: Optional[str] = None
 
+    def render_context(self) -> dict:
+        """
+        Contexto do template atendente_geral direto dos atributos (sem model_dump
+        nem cópia dos produtos), com os padrões do formulário para o que veio vazio.
+        Campos que o webhook nunca repassou ao template ficam de fora (mesmo prompt de antes).
+        """
+        contexto = {campo: valor for campo, valor in self if campo not in _WEBHOOK_EXCLUDED_FIELDS}
+        contexto["estilo_comunicacao"] = self.estilo_comunicacao or "Máximo 2 frases curtas por parágrafo"
+        contexto["possui_menu"] = self.possui_menu if self.possui_menu is not None else bool(self.menu_opcoes)
+        contexto["possui_treinamento"] = bool(self.possui_treinamento)
+        contexto["possui_objecoes"] = bool(self.possui_objecoes)
+        for campo in _WEBHOOK_LIST_FIELDS:
+            if contexto[campo] is None:
+                contexto[campo] = []
+        return contexto
+
+
+_WEBHOOK_LIST_FIELDS = (
+    "menu_opcoes", "servicos_lista", "regras_personalizadas", "produtos_catalogo", "regras_comunicacao", "guardrails_extras",
+)
+_WEBHOOK_EXCLUDED_FIELDS = frozenset({"texto_duvida_tecnica", "itens_adicionais", "email_destino"})
+
 
 class LocadoraPromptRequest(BaseModel):
     """Schema para o template de locadora de equipamentos (estilo JundMega)."""
@@ -149,8 +330,9 @@ class LocadoraPromptRequest(BaseModel):
     foco_atuacao: str = ""
     ticket_medio: str = ""
 
-    # Catálogo de Equipamentos
+    # Catálogo de Equipamentos (ou catalog_id de um catálogo salvo em POST /catalog ou /upload-pdf)
     categorias_equipamentos: list[CategoriaEquipamento] = Field(default_factory=list)
+    catalog_id: Optional[str] = None
 
     # Fluxo de Coleta
     etapas_fluxo: list[str] = Field(default_factory=lambda: [
@@ -188,3 +370,19 @@ class LocadoraPromptRequest(BaseModel):
 
     # Instrução Final
     instrucao_final: Optional[str] = None
+
+
+def _template_type(valor) -> str:
+    if isinstance(valor, dict):
+        return valor.get("template_type") or "atendente_geral"
+    return getattr(valor, "template_type", "atendente_geral")
+
+
+# Corpo do /generate: o template_type escolhe o schema e a validação acontece uma única vez
+GenerateRequest = Annotated[
+    Union[
+        Annotated[PromptRequest, Tag("atendente_geral")],
+        Annotated[LocadoraPromptRequest, Tag("locadora_equipamentos")],
+    ],
+    Discriminator(_template_type, custom_error_type="template_invalido", custom_error_message="Tipo de template inválido"),
+]
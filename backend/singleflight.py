@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+# ============================================================
+# SINGLE-FLIGHT: CHAMADAS IDÊNTICAS SIMULTÂNEAS COMPARTILHAM UM RESULTADO
+# ============================================================
+
+class SingleFlight:
+    """
+    Enquanto uma chamada com determinada chave está em andamento, chamadas
+    com a mesma chave aguardam o mesmo resultado (ou a mesma exceção)
+    em vez de disparar outra requisição.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            # A chamada roda como task própria: cancelar um dos chamadores
+            # (ex.: cliente desconectou) não derruba os demais
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marca a exceção como consumida caso todos os chamadores tenham desistido
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,160 @@
+import os
+import gzip
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Message, Receive, Scope, Send
+
+
+# ============================================================
+# ARQUIVOS ESTÁTICOS PRÉ-COMPRIMIDOS (frontend) E COMPRESSÃO DAS RESPOSTAS
+# ============================================================
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+# 0 = sempre revalidar (o index.html não tem hash no nome); com ETag a revalidação custa um 304
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "0"))
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1000"))
+
+
+def _brotli():
+    # Brotli é opcional: sem o pacote, o arquivo é servido em gzip
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _accepts(accept_encoding: str, encoding: str) -> bool:
+    for item in accept_encoding.split(","):
+        nome, _, params = item.strip().partition(";")
+        if nome.strip().lower() in (encoding, "*"):
+            q = params.strip()
+            return not (q.startswith("q=") and float(q[2:] or 0) == 0)
+    return False
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparação fraca do If-None-Match (lista de ETags ou "*") com o ETag atual."""
+    if not if_none_match:
+        return False
+    alvo = etag.removeprefix("W/").strip('"')
+    tags = {tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")}
+    return "*" in tags or alvo in tags
+
+
+class StaticAsset:
+    """
+    Arquivo lido uma vez e mantido em memória já comprimido (gzip e, se
+    disponível, brotli), com ETag forte por representação e resposta 304
+    para GET condicional. Em desenvolvimento, recarrega quando o arquivo muda.
+    """
+
+    def __init__(self, path: Path, media_type: str, auto_reload: Optional[bool] = None):
+        self.path = Path(path)
+        self.media_type = media_type
+        self.auto_reload = _env_flag("STATIC_AUTO_RELOAD", not os.getenv("VERCEL")) if auto_reload is None else auto_reload
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self.variants: dict[str, bytes] = {}
+        self.etag = ""
+
+    @property
+    def loaded(self) -> bool:
+        return self._mtime is not None
+
+    def load(self) -> bool:
+        """Lê e comprime o arquivo. Retorna False se ele não existir."""
+        try:
+            stat = self.path.stat()
+            body = self.path.read_bytes()
+        except FileNotFoundError:
+            return False
+
+        variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        brotli = _brotli()
+        if brotli is not None:
+            variants["br"] = brotli.compress(body, quality=11)
+
+        with self._lock:
+            self.variants = variants
+            self.etag = hashlib.sha256(body).hexdigest()[:32]
+            self._mtime = stat.st_mtime
+        return True
+
+    def _ensure_fresh(self) -> bool:
+        if not self.loaded:
+            return self.load()
+        if self.auto_reload:
+            try:
+                if self.path.stat().st_mtime != self._mtime:
+                    return self.load()
+            except FileNotFoundError:
+                return False
+        return True
+
+    def _matches(self, if_none_match: str) -> bool:
+        # Qualquer representação (br/gzip/identity) tem o mesmo conteúdo
+        return any(etag_matches(if_none_match, f'"{self.etag}{sufixo}"') for sufixo in ("", "-gzip", "-br"))
+
+    def response(self, request: Request) -> Optional[Response]:
+        """Resposta para o request, ou None se o arquivo não existir."""
+        if not self._ensure_fresh():
+            return None
+
+        accept = request.headers.get("accept-encoding", "")
+        encoding = next((e for e in ("br", "gzip") if e in self.variants and _accepts(accept, e)), "identity")
+        etag = f'"{self.etag}"' if encoding == "identity" else f'"{self.etag}-{encoding}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={STATIC_MAX_AGE}" if STATIC_MAX_AGE else "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self._matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
+
+
+# Respostas em stream não podem ficar presas no buffer do compressor
+STREAMING_MEDIA_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+class _StreamAwareGZipResponder(GZipResponder):
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if content_type.startswith(STREAMING_MEDIA_TYPES):
+                # Mesmo caminho de quem já definiu Content-Encoding: repassa sem comprimir
+                self.content_encoding_set = True
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZip para respostas JSON grandes (prompts renderizados); SSE e NDJSON passam direto."""
+
+    def __init__(self, app, minimum_size: int = GZIP_MIN_SIZE, compresslevel: int = 6):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("accept-encoding", ""):
+            responder = _StreamAwareGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
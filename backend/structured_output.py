@@ -0,0 +1,170 @@
+import os
+import copy
+import json
+from functools import lru_cache
+from typing import Iterable, Optional, get_args, get_origin
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+
+# ============================================================
+# SAÍDA ESTRUTURADA (JSON SCHEMA) E PARSER TOLERANTE
+# ============================================================
+
+# STRUCTURED_OUTPUT=0 volta ao modo antigo (texto livre + parser tolerante)
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1").lower() not in ("0", "false", "no", "off")
+
+
+def _strict(schema: dict) -> dict:
+    """Adapta o schema do pydantic ao modo strict da OpenAI (tudo obrigatório, sem extras/defaults)."""
+    if isinstance(schema, dict):
+        schema = {k: _strict(v) for k, v in schema.items() if k not in ("default", "title")}
+        if schema.get("type") == "object" and "properties" in schema:
+            schema["required"] = list(schema["properties"])
+            schema["additionalProperties"] = False
+    elif isinstance(schema, list):
+        schema = [_strict(item) for item in schema]
+    return schema
+
+
+def response_format_for(model: type[BaseModel], campos: Optional[Iterable[str]] = None) -> Optional[dict]:
+    """
+    response_format de json_schema derivado do modelo pydantic. `campos` restringe
+    as propriedades do objeto raiz (ex.: só os campos do briefing enviados).
+    """
+    if not STRUCTURED_OUTPUT:
+        return None
+
+    schema = copy.deepcopy(model.model_json_schema())
+    if campos is not None:
+        campos = set(campos)
+        schema["properties"] = {k: v for k, v in schema["properties"].items() if k in campos}
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model.__name__, "schema": _strict(schema), "strict": True},
+    }
+
+
+def _strip_fences(texto: str) -> str:
+    texto = texto.strip()
+    if texto.startswith("```"):
+        texto = texto.split("```")[1]
+        if texto.startswith("json"):
+            texto = texto[4:]
+    return texto.strip()
+
+
+def repair_json(texto: str) -> str:
+    """
+    Recupera um JSON truncado (ex.: resposta cortada por max_tokens): percorre o
+    texto acompanhando strings e aninhamento, corta no último elemento completo
+    e fecha as chaves/colchetes que ficaram abertos.
+    """
+    inicio = min((i for i in (texto.find("{"), texto.find("[")) if i != -1), default=-1)
+    if inicio == -1:
+        raise ValueError("Nenhum JSON encontrado na resposta")
+    texto = texto[inicio:]
+
+    pilha: list[str] = []
+    em_string = escape = False
+    corte, pilha_corte = None, []
+
+    for i, ch in enumerate(texto):
+        if em_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                em_string = False
+            continue
+        if ch == '"':
+            em_string = True
+        elif ch in "{[":
+            pilha.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not pilha:
+                break
+            pilha.pop()
+            corte, pilha_corte = i + 1, list(pilha)
+            if not pilha:
+                return texto[:i + 1]
+        elif ch == ",":
+            # Tudo antes da vírgula está completo
+            corte, pilha_corte = i, list(pilha)
+
+    if corte is None:
+        raise ValueError("JSON incompleto demais para recuperar")
+    return texto[:corte] + "".join(reversed(pilha_corte))
+
+
+def parse_lenient(texto: str):
+    """json.loads direto; se falhar, remove cercas ``` e tenta recuperar o JSON truncado."""
+    try:
+        return json.loads(texto)
+    except json.JSONDecodeError:
+        pass
+    texto = _strip_fences(texto)
+    try:
+        return json.loads(texto)
+    except json.JSONDecodeError:
+        return json.loads(repair_json(texto))
+
+
+@lru_cache(maxsize=None)
+def _adapter(annotation) -> TypeAdapter:
+    return TypeAdapter(annotation)
+
+
+def _recover_item(tipo, item):
+    # Objeto aninhado (ex.: categoria): recupera campo a campo, listas internas item a item
+    if isinstance(tipo, type) and issubclass(tipo, BaseModel) and isinstance(item, dict):
+        campos = {
+            nome: _recover_value(campo.annotation, item[nome])
+            for nome, campo in tipo.model_fields.items() if nome in item
+        }
+        return tipo.model_validate(campos)
+    return _recover_value(tipo, item)
+
+
+def _recover_value(annotation, valor):
+    """
+    Valida o valor; listas inválidas são filtradas item a item (recursivamente:
+    um item ruim dentro de uma categoria não descarta a categoria inteira).
+    """
+    try:
+        return _adapter(annotation).validate_python(valor)
+    except ValidationError as erro:
+        if not isinstance(valor, list) or get_origin(annotation) is not list:
+            raise
+        (tipo_item,) = get_args(annotation)
+        validos = []
+        for item in valor:
+            try:
+                validos.append(_recover_item(tipo_item, item))
+            except ValidationError:
+                continue
+        if not validos:
+            raise erro
+        return validos
+
+
+def parse_model_reply(texto: str, model: type[BaseModel]) -> dict:
+    """
+    Converte a resposta da IA em dict validado pelo modelo. Campos inválidos são
+    descartados e listas mantêm apenas os itens válidos (recuperação parcial).
+    """
+    dados = parse_lenient(texto)
+    if not isinstance(dados, dict):
+        raise ValueError("Resposta da IA não é um objeto JSON")
+
+    resultado = {}
+    for nome, campo in model.model_fields.items():
+        if nome not in dados:
+            continue
+        try:
+            valor = _recover_value(campo.annotation, dados[nome])
+        except ValidationError:
+            continue
+        resultado[nome] = _adapter(campo.annotation).dump_python(valor, mode="json")
+    return resultado
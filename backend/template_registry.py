@@ -0,0 +1,126 @@
+import os
+import sys
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+
+from jinja2 import (
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    ModuleLoader,
+    Template,
+    TemplateNotFound,
+)
+
+
+# ============================================================
+# REGISTRO DE TEMPLATES PRÉ-COMPILADOS
+# ============================================================
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+class TemplateRegistry:
+    """
+    Compila todos os templates do TEMPLATE_MAP uma única vez e os mantém em memória.
+
+    - Produção (padrão no Vercel): sem checagem de mtime a cada requisição.
+    - Desenvolvimento: auto_reload ligado e reload() disponível para recarregar tudo.
+    - Bytecode cache em disco evita recompilar entre processos da mesma máquina.
+    - Se existir um diretório de templates pré-compilados (ver compile_to), ele tem prioridade.
+    """
+
+    def __init__(
+        self,
+        templates_dir: Path,
+        template_map: dict[str, str],
+        auto_reload: Optional[bool] = None,
+        bytecode_dir: Optional[str] = None,
+        compiled_dir: Optional[Path] = None,
+    ):
+        self.templates_dir = Path(templates_dir)
+        self.template_map = template_map
+        self.auto_reload = _env_flag("TEMPLATES_AUTO_RELOAD", not os.getenv("VERCEL")) if auto_reload is None else auto_reload
+
+        # Sem diretório explícito, o padrão do Jinja: diretório do usuário (0700) no temporário,
+        # com dono e permissões conferidos (um /tmp fixo deixaria outro usuário plantar bytecode)
+        bytecode_dir = bytecode_dir or os.getenv("TEMPLATES_BYTECODE_DIR")
+        if bytecode_dir:
+            os.makedirs(bytecode_dir, mode=0o700, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+        else:
+            bytecode_cache = FileSystemBytecodeCache()
+
+        loader = FileSystemLoader(self.templates_dir)
+        # Templates compilados no build só valem em produção (não são recarregados)
+        compiled_dir = Path(compiled_dir or os.getenv("TEMPLATES_COMPILED_DIR") or self.templates_dir.parent / "templates_compiled")
+        if not self.auto_reload and compiled_dir.is_dir():
+            loader = ChoiceLoader([ModuleLoader(str(compiled_dir)), loader])
+
+        self.env = Environment(
+            loader=loader,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            auto_reload=self.auto_reload,
+            bytecode_cache=bytecode_cache,
+        )
+        self._compiled: dict[str, Template] = {}
+        self._fingerprints: dict[str, tuple[Template, str]] = {}
+        self._lock = threading.Lock()
+
+    def warm(self) -> None:
+        """Compila todos os templates do mapa (chamado no startup)."""
+        with self._lock:
+            self._compiled = {
+                template_type: self.env.get_template(name)
+                for template_type, name in self.template_map.items()
+            }
+
+    def reload(self) -> None:
+        """Descarta templates e bytecode em memória e recompila (uso em desenvolvimento)."""
+        if self.env.cache is not None:
+            self.env.cache.clear()
+        if self.env.bytecode_cache is not None:
+            self.env.bytecode_cache.clear()
+        self.warm()
+
+    def get(self, template_type: str) -> Template:
+        """Retorna o template compilado; levanta TemplateNotFound se o tipo não existir."""
+        template = self._compiled.get(template_type)
+        if template is None or (self.auto_reload and not template.is_up_to_date):
+            name = self.template_map.get(template_type)
+            if name is None:
+                raise TemplateNotFound(template_type)
+            template = self.env.get_template(name)
+            self._compiled[template_type] = template
+        return template
+
+    def fingerprint(self, template_type: str) -> str:
+        """SHA-256 do arquivo do template em uso; muda quando o template é recarregado."""
+        template = self.get(template_type)
+        cached = self._fingerprints.get(template_type)
+        if cached is None or cached[0] is not template:
+            source = (self.templates_dir / self.template_map[template_type]).read_bytes()
+            cached = self._fingerprints[template_type] = (template, hashlib.sha256(source).hexdigest())
+        return cached[1]
+
+    def compile_to(self, target: Path) -> None:
+        """Gera módulos Python dos templates para serem empacotados no build."""
+        self.env.compile_templates(str(target), zip=None, filter_func=lambda name: name in self.template_map.values())
+
+
+if __name__ == "__main__":
+    # Uso: python template_registry.py [diretório de saída]
+    base = Path(__file__).parent
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else base / "templates_compiled"
+    from main import TEMPLATE_MAP
+
+    TemplateRegistry(base / "templates", TEMPLATE_MAP, auto_reload=True).compile_to(target)
+    print(f"Templates compilados em {target}")
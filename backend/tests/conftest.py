@@ -0,0 +1,56 @@
+import os
+import sys
+import types
+import tempfile
+
+import pytest
+
+# Estado persistente dos testes isolado num diretório temporário (nada em /tmp compartilhado)
+_TMP = tempfile.mkdtemp(prefix="gerador-tests-")
+os.environ.setdefault("PROMPT_STORE_PATH", os.path.join(_TMP, "prompts.sqlite3"))
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(_TMP, "jobs.sqlite3"))
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+os.environ.setdefault("CATALOG_STORE_BACKEND", "memory")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCompletions:
+    """chat.completions da OpenAI simulado: devolve `reply` (texto ou função dos kwargs)."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls: list[dict] = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        texto = self.reply(kwargs) if callable(self.reply) else self.reply
+        usage = types.SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        if kwargs.get("stream"):
+            return self._stream(texto, usage if (kwargs.get("stream_options") or {}).get("include_usage") else None)
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=texto))],
+            usage=usage,
+        )
+
+    @staticmethod
+    async def _stream(texto, usage):
+        """Como a API: um chunk por trecho e, com include_usage, um último só com o usage."""
+        for trecho in texto.split(" "):
+            delta = types.SimpleNamespace(content=trecho + " ")
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)], usage=None)
+        if usage is not None:
+            yield types.SimpleNamespace(choices=[], usage=usage)
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Troca o cliente da OpenAI por um fake; retorna a função que define a resposta."""
+    import ai_service
+
+    def usar(reply) -> FakeCompletions:
+        completions = FakeCompletions(reply)
+        monkeypatch.setattr(ai_service, "_client", types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions)))
+        return completions
+
+    return usar
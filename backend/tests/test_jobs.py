@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+
+import jobs
+from jobs import JobQueue, JobWorkers
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+
+
+def _expirar_lease(monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_LEASE_SECONDS", 0.01)
+    time.sleep(0.02)
+
+
+def test_job_orfao_volta_a_rodar_apos_o_lease(queue, monkeypatch):
+    job_id = queue.submit("teste", {})
+    assert queue.claim()["attempts"] == 1
+    assert queue.claim() is None  # dentro do lease ninguém pega
+
+    _expirar_lease(monkeypatch)
+    job = queue.claim()
+    assert job["id"] == job_id
+    assert job["attempts"] == 2
+
+
+def test_job_orfao_com_tentativas_esgotadas_vai_para_failed(queue, monkeypatch):
+    job_id = queue.submit("teste", {})
+    queue.claim()
+    _expirar_lease(monkeypatch)
+    queue.claim()
+    time.sleep(0.02)
+
+    assert queue.claim() is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert "tentativas esgotadas" in job["error"]
+
+
+def test_heartbeat_impede_reclaim_de_job_longo(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_LEASE_SECONDS", 0.2)
+    monkeypatch.setattr(jobs, "JOBS_HEARTBEAT_INTERVAL", 0.05)
+    execucoes = []
+
+    async def handler(payload):
+        execucoes.append(payload)
+        await asyncio.sleep(0.6)  # bem mais que o lease
+        return {"ok": True}
+
+    async def cenario():
+        workers = JobWorkers(queue, concurrency=1)
+        workers.register("teste", handler)
+        job_id = queue.submit("teste", {"n": 1})
+        workers.start()
+        await asyncio.sleep(0.4)
+        reclamado = queue.claim()  # outro worker tentando pegar o job como órfão
+        await workers.stop(timeout=2)
+        return job_id, reclamado
+
+    job_id, reclamado = asyncio.run(cenario())
+    assert reclamado is None
+    assert execucoes == [{"n": 1}]
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["attempts"] == 1
@@ -0,0 +1,42 @@
+import json
+import asyncio
+
+import ai_service
+from schemas import PromptRequest
+
+
+def _dados(**extra) -> dict:
+    return PromptRequest(
+        nome_empresa="Locamix", nome_atendente="Ana",
+        regra_preco_texto="Preço só pelo consultor", opcoes_transbordo_imediato="Orçamento", **extra,
+    ).model_dump()
+
+
+def test_null_da_ia_nao_apaga_o_valor_do_usuario(fake_openai, monkeypatch):
+    monkeypatch.setattr(ai_service, "briefing_cache", ai_service.build_cache("TESTE_BRIEFING"))
+    fake_openai(json.dumps({
+        "nome_empresa": None, "nome_atendente": None, "endereco": None,
+        "regra_preco_texto": "Valores apenas com o consultor", "opcoes_transbordo_imediato": None,
+    }))
+
+    resultado = asyncio.run(ai_service.preprocess_briefing(_dados()))
+
+    assert resultado["nome_empresa"] == "Locamix"
+    assert resultado["nome_atendente"] == "Ana"
+    assert resultado["endereco"] == "Consulte nosso atendimento"
+    assert resultado["regra_preco_texto"] == "Valores apenas com o consultor"
+    # Limpeza intencional do transbordo continua valendo
+    assert resultado["opcoes_transbordo_imediato"] is None
+
+
+def test_cache_nao_guarda_nulls(fake_openai, monkeypatch):
+    cache = ai_service.build_cache("TESTE_BRIEFING")
+    monkeypatch.setattr(ai_service, "briefing_cache", cache)
+    completions = fake_openai(json.dumps({"nome_empresa": None, "regra_preco_texto": "Valores com o consultor"}))
+
+    asyncio.run(ai_service.preprocess_briefing(_dados()))
+    segunda = asyncio.run(ai_service.preprocess_briefing(_dados()))
+
+    assert len(completions.calls) == 1
+    assert segunda["nome_empresa"] == "Locamix"
+    assert segunda["regra_preco_texto"] == "Valores com o consultor"
@@ -0,0 +1,58 @@
+import pytest
+
+from prompt_sections import SectionPatchError, apply_patch, parse_sections
+
+PROMPT = "Preâmbulo\n\n## 1) Identidade\nA\n\n## 2) Menu\nB\n\n## 3) Objeções\nC\n"
+
+
+def _numeros(prompt: str) -> list[tuple[int, str]]:
+    return [(s.numero, s.titulo) for s in parse_sections(prompt)[1]]
+
+
+def test_altera_so_a_secao_do_patch():
+    resultado, alteradas = apply_patch(PROMPT, {"secoes": [{"numero": 2, "conteudo": "## 2) Menu\nB2\n"}]})
+    assert resultado == PROMPT.replace("\nB\n", "\nB2\n")
+    assert alteradas == [2]
+
+
+def test_insercao_renumera_as_secoes_seguintes():
+    patch = {"novas_secoes": [{"apos": 1, "conteudo": "## 2) Horário\nH"}]}
+    resultado, alteradas = apply_patch(PROMPT, patch)
+    assert _numeros(resultado) == [(1, "Identidade"), (2, "Horário"), (3, "Menu"), (4, "Objeções")]
+    assert "## 3) Menu\nB\n" in resultado
+    assert alteradas == [2]
+
+
+def test_insercao_no_fim_e_edicao_depois_de_insercao():
+    patch = {
+        "secoes": [{"numero": 3, "conteudo": "## 3) Objeções\nC2\n"}],
+        "novas_secoes": [{"apos": 1, "conteudo": "## 9) Nova\nN"}, {"apos": 3, "conteudo": "## 9) Final\nF"}],
+    }
+    resultado, alteradas = apply_patch(PROMPT, patch)
+    assert _numeros(resultado) == [(1, "Identidade"), (2, "Nova"), (3, "Menu"), (4, "Objeções"), (5, "Final")]
+    assert "## 4) Objeções\nC2\n" in resultado
+    assert alteradas == [2, 4, 5]
+
+
+def test_conteudo_com_cabecalhos_extras_e_recusado():
+    patch = {"secoes": [{"numero": 2, "conteudo": "## 2) Menu\nB2\n## 3) Objeções\nHACK"}]}
+    with pytest.raises(SectionPatchError):
+        apply_patch(PROMPT, patch)
+
+
+def test_nova_secao_com_cabecalhos_extras_ou_sem_cabecalho_e_recusada():
+    with pytest.raises(SectionPatchError):
+        apply_patch(PROMPT, {"novas_secoes": [{"apos": 1, "conteudo": "## 2) X\nx\n## 3) Y\ny"}]})
+    with pytest.raises(SectionPatchError):
+        apply_patch(PROMPT, {"novas_secoes": [{"apos": 1, "conteudo": "texto solto"}]})
+
+
+def test_prompt_com_numeros_repetidos_e_recusado():
+    duplicado = PROMPT.replace("## 3) Objeções", "## 2) Objeções")
+    with pytest.raises(SectionPatchError):
+        apply_patch(duplicado, {"secoes": [{"numero": 2, "conteudo": "## 2) Menu\nB2\n"}]})
+
+
+def test_secao_fora_das_permitidas_e_recusada():
+    with pytest.raises(SectionPatchError):
+        apply_patch(PROMPT, {"secoes": [{"numero": 3, "conteudo": "## 3) Objeções\nC2\n"}]}, permitidas={2})
@@ -0,0 +1,66 @@
+import json
+import os
+import sqlite3
+import stat
+import tempfile
+
+import pytest
+
+import prompt_store
+from prompt_store import SQLitePromptStore
+
+PROMPT = 'Identidade\n* `url_chatwoot = "https://chat.exemplo.com"`\n* `apikey_chatwoot = "segredo123"`\n'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLitePromptStore(str(tmp_path / "prompts.sqlite3"))
+
+
+def _linhas_gravadas(store) -> list[sqlite3.Row]:
+    conn = sqlite3.connect(store.path)
+    conn.row_factory = sqlite3.Row
+    return conn.execute("SELECT prompt, briefing FROM prompt_versions").fetchall()
+
+
+def test_credenciais_sao_mascaradas_antes_de_gravar(store):
+    briefing = json.dumps({"nome_empresa": "Loja", "apikey_chatwoot": "segredo123", "url_chatwoot": "https://chat.exemplo.com"})
+    store.save("Loja", "1", PROMPT, "webhook", briefing=briefing)
+    store.save("Outra", "1", PROMPT, "generate", briefing={"apikey_chatwoot": "segredo123"})
+
+    for linha in _linhas_gravadas(store):
+        assert "segredo123" not in linha["prompt"]
+        assert "segredo123" not in linha["briefing"]
+        assert 'apikey_chatwoot = "***"' in linha["prompt"]
+    with open(store.path, "rb") as f:
+        assert b"segredo123" not in f.read()
+
+
+def test_arquivo_criado_so_para_o_dono(store):
+    assert stat.S_IMODE(os.stat(store.path).st_mode) == 0o600
+
+
+def test_caminho_padrao_em_diretorio_privado(tmp_path, monkeypatch):
+    monkeypatch.delenv("PROMPT_STORE_PATH", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    store = prompt_store.build_prompt_store()
+
+    diretorio = os.path.dirname(store.path)
+    assert diretorio != str(tmp_path)
+    assert stat.S_IMODE(os.stat(diretorio).st_mode) == 0o700
+
+
+def test_diretorio_padrao_aberto_para_outros_e_recusado(tmp_path, monkeypatch):
+    monkeypatch.delenv("PROMPT_STORE_PATH", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    os.mkdir(tmp_path / f"gerador-{os.getuid()}", 0o777)
+    os.chmod(tmp_path / f"gerador-{os.getuid()}", 0o777)
+    with pytest.raises(RuntimeError):
+        prompt_store.build_prompt_store()
+
+
+def test_voltar_a_um_conteudo_antigo_cria_nova_versao(store):
+    assert store.save("Loja", "1", "A", "generate")["versao"] == 1
+    assert store.save("Loja", "1", "B", "refine")["versao"] == 2
+    assert store.save("Loja", "1", "A", "generate") == {"versao": 3, "content_hash": prompt_store.content_hash("A"), "nova": True}
+    assert store.save("Loja", "1", "A", "generate")["nova"] is False
@@ -0,0 +1,26 @@
+import asyncio
+
+import ai_service
+from metrics import LLM_CALLS, LLM_TOKENS, _label_key
+
+
+def _valor(counter, **labels) -> float:
+    return counter._values.get(_label_key(labels), 0.0)
+
+
+def test_stream_de_refine_contabiliza_tokens_do_ultimo_chunk(fake_openai):
+    completions = fake_openai("prompt refinado com sucesso")
+    chamadas = _valor(LLM_CALLS, operation="refine")
+    prompt_tokens = _valor(LLM_TOKENS, operation="refine", kind="prompt")
+    completion_tokens = _valor(LLM_TOKENS, operation="refine", kind="completion")
+
+    async def consumir() -> str:
+        return "".join([trecho async for trecho in ai_service.refine_prompt_stream("## 1) Identidade\nTexto", "mude")])
+
+    texto = asyncio.run(consumir())
+
+    assert texto.split() == ["prompt", "refinado", "com", "sucesso"]
+    assert completions.calls[0]["stream_options"] == {"include_usage": True}
+    assert _valor(LLM_CALLS, operation="refine") == chamadas + 1
+    assert _valor(LLM_TOKENS, operation="refine", kind="prompt") == prompt_tokens + 10
+    assert _valor(LLM_TOKENS, operation="refine", kind="completion") == completion_tokens + 5
@@ -0,0 +1,22 @@
+from schemas import BriefingProcessado, CatalogoEstruturado
+from structured_output import parse_model_reply
+
+
+def test_item_invalido_dentro_da_categoria_nao_descarta_a_categoria():
+    texto = '{"categorias": [{"categoria": "Compactação", "itens": ["Sapo", 5, null, "Placa"]}, 7]}'
+    assert parse_model_reply(texto, CatalogoEstruturado) == {
+        "categorias": [{"categoria": "Compactação", "itens": ["Sapo", "Placa"]}],
+    }
+
+
+def test_categoria_com_campo_escalar_invalido_e_descartada():
+    texto = '{"categorias": [{"categoria": null, "itens": ["X"]}, {"categoria": "Elevação", "itens": ["Talha"]}]}'
+    assert parse_model_reply(texto, CatalogoEstruturado)["categorias"] == [{"categoria": "Elevação", "itens": ["Talha"]}]
+
+
+def test_produto_invalido_e_filtrado_e_campo_invalido_ignorado():
+    texto = '{"produtos_catalogo": [{"nome": "P", "precos": 3}, {"nome": "Q"}], "menu_opcoes": ["a", {}], "endereco": 1}'
+    resultado = parse_model_reply(texto, BriefingProcessado)
+    assert resultado["produtos_catalogo"] == [{"nome": "Q", "precos": ""}]
+    assert resultado["menu_opcoes"] == ["a"]
+    assert "endereco" not in resultado
@@ -0,0 +1,197 @@
+import os
+import math
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from metrics import registry
+
+
+# ============================================================
+# ORÇAMENTO DE TOKENS E ESCOLHA DO MODELO POR CHAMADA
+# ============================================================
+
+LLM_PLANNED_TOKENS = registry.counter("llm_planned_tokens_total", "Tokens de entrada contados e max_tokens reservados por operação")
+LLM_OVERFLOWS = registry.counter("llm_context_overflow_total", "Chamadas recusadas antes do envio por estourar a janela de contexto")
+
+# Modelo padrão; LLM_MODEL_<OPERACAO> fixa o modelo de uma operação (ex.: LLM_MODEL_REFINE=gpt-4o)
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+# Entradas acima de LLM_LARGE_INPUT_TOKENS vão para LLM_MODEL_LARGE (se configurado)
+LLM_MODEL_LARGE = os.getenv("LLM_MODEL_LARGE") or None
+LLM_LARGE_INPUT_TOKENS = int(os.getenv("LLM_LARGE_INPUT_TOKENS", "12000"))
+
+# Saída mínima reservada e folga para a diferença entre a contagem local e a da API
+LLM_MIN_OUTPUT_TOKENS = int(os.getenv("LLM_MIN_OUTPUT_TOKENS", "256"))
+LLM_CONTEXT_MARGIN = int(os.getenv("LLM_CONTEXT_MARGIN", "256"))
+
+# Sem tokenizer: caracteres por token, conservador para português (acentos custam mais)
+CHARS_PER_TOKEN = float(os.getenv("LLM_CHARS_PER_TOKEN", "3.2"))
+
+# Custo fixo de cada mensagem no formato de chat (papel + separadores) e do início da resposta
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+@dataclass(frozen=True)
+class ModelLimits:
+    context: int
+    max_output: int
+
+
+# Janela de contexto e saída máxima dos modelos conhecidos
+MODEL_LIMITS = {
+    "gpt-4o-mini": ModelLimits(128_000, 16_384),
+    "gpt-4o": ModelLimits(128_000, 16_384),
+    "gpt-4.1": ModelLimits(1_047_576, 32_768),
+    "gpt-4.1-mini": ModelLimits(1_047_576, 32_768),
+    "gpt-4.1-nano": ModelLimits(1_047_576, 32_768),
+    "gpt-3.5-turbo": ModelLimits(16_385, 4_096),
+}
+# Modelos fora da tabela: LLM_CONTEXT_WINDOW / LLM_MAX_OUTPUT_TOKENS
+DEFAULT_LIMITS = ModelLimits(
+    int(os.getenv("LLM_CONTEXT_WINDOW", "128000")),
+    int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "16384")),
+)
+
+
+def model_limits(model: str) -> ModelLimits:
+    if model in MODEL_LIMITS:
+        return MODEL_LIMITS[model]
+    # Versões datadas (gpt-4o-mini-2024-07-18) usam os limites do modelo base
+    base = max((nome for nome in MODEL_LIMITS if model.startswith(nome + "-")), key=len, default=None)
+    return MODEL_LIMITS[base] if base else DEFAULT_LIMITS
+
+
+class ContextOverflowError(ValueError):
+    """A entrada não deixa espaço para a saída mínima necessária na janela de contexto do modelo."""
+
+    def __init__(self, model: str, input_tokens: int):
+        self.model = model
+        self.input_tokens = input_tokens
+        super().__init__(f"Texto grande demais para o modelo {model} (~{input_tokens} tokens de entrada)")
+
+
+# ------------------------------------------------------------
+# Contagem de tokens
+# ------------------------------------------------------------
+
+# Arquivos BPE do tiktoken: só são lidos de TIKTOKEN_CACHE_DIR (padrão backend/.tiktoken_cache,
+# preenchido por `python token_budget.py` na instalação). Sem o arquivo, conta por CHARS_PER_TOKEN.
+TIKTOKEN_CACHE_DIR = os.environ.setdefault("TIKTOKEN_CACHE_DIR", str(Path(__file__).parent / ".tiktoken_cache"))
+BPE_URLS = {
+    "o200k_base": "https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken",
+    "cl100k_base": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+}
+
+_encodings: dict[str, object] = {}
+_encodings_lock = threading.Lock()
+
+
+def _encoding_name(model: str) -> str:
+    from tiktoken.model import encoding_name_for_model
+
+    try:
+        return encoding_name_for_model(model)
+    except KeyError:
+        return "o200k_base"
+
+
+def _bpe_cached(nome: str) -> bool:
+    # Mesmo nome de arquivo que o tiktoken usa no cache (sha1 da URL)
+    url = BPE_URLS.get(nome)
+    return url is not None and os.path.exists(os.path.join(TIKTOKEN_CACHE_DIR, hashlib.sha1(url.encode()).hexdigest()))
+
+
+def _encoding(model: str):
+    """
+    Tokenizer do tiktoken para o modelo, ou None sem o pacote ou sem o arquivo
+    BPE em TIKTOKEN_CACHE_DIR: a contagem nunca faz download durante a requisição.
+    """
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                import tiktoken
+            except ImportError:
+                _encodings[model] = None
+            else:
+                nome = _encoding_name(model)
+                try:
+                    _encodings[model] = tiktoken.get_encoding(nome) if _bpe_cached(nome) else None
+                except Exception:
+                    _encodings[model] = None
+        return _encodings[model]
+
+
+def warm_encodings() -> None:
+    """Carrega no startup os tokenizers dos modelos configurados (do cache local, sem rede)."""
+    for model in filter(None, (LLM_MODEL, LLM_MODEL_LARGE)):
+        _encoding(model)
+
+
+def count_tokens(text: str, model: str = LLM_MODEL) -> int:
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages: list[dict], model: str = LLM_MODEL) -> int:
+    return sum(count_tokens(m["content"], model) + TOKENS_PER_MESSAGE for m in messages) + TOKENS_PER_REPLY
+
+
+# ------------------------------------------------------------
+# Planejamento
+# ------------------------------------------------------------
+
+@dataclass(frozen=True)
+class TokenPlan:
+    model: str
+    input_tokens: int
+    max_tokens: int
+
+    def params(self) -> dict:
+        return {"model": self.model, "max_tokens": self.max_tokens}
+
+
+def _output_room(model: str, input_tokens: int) -> int:
+    # Saída possível: limitada pela saída máxima do modelo e pelo que sobra da janela
+    limits = model_limits(model)
+    return min(limits.max_output, limits.context - input_tokens - LLM_CONTEXT_MARGIN)
+
+
+def plan(operacao: str, messages: list[dict], expected_output: int, min_output: int = LLM_MIN_OUTPUT_TOKENS) -> TokenPlan:
+    """
+    Conta a entrada, escolhe o modelo (por operação e tamanho da entrada) e
+    reserva `expected_output` tokens de saída, dentro do que o modelo permite.
+    Se não houver espaço nem para `min_output` (ex.: reescrever um prompt
+    maior que a saída máxima), levanta ContextOverflowError antes da chamada.
+    """
+    fixado = os.getenv(f"LLM_MODEL_{operacao.upper()}")
+    model = fixado or LLM_MODEL
+    input_tokens = count_message_tokens(messages, model)
+    espaco = _output_room(model, input_tokens)
+
+    # Entrada grande, ou que não cabe no modelo padrão, vai para o modelo maior (se configurado)
+    if LLM_MODEL_LARGE and not fixado and (input_tokens > LLM_LARGE_INPUT_TOKENS or espaco < min_output):
+        model = LLM_MODEL_LARGE
+        input_tokens = count_message_tokens(messages, model)
+        espaco = _output_room(model, input_tokens)
+
+    if espaco < min_output:
+        LLM_OVERFLOWS.inc(operation=operacao)
+        raise ContextOverflowError(model, input_tokens)
+
+    max_tokens = min(max(expected_output, min_output), espaco)
+    LLM_PLANNED_TOKENS.inc(input_tokens, operation=operacao, kind="input")
+    LLM_PLANNED_TOKENS.inc(max_tokens, operation=operacao, kind="max_output")
+    return TokenPlan(model, input_tokens, max_tokens)
+
+
+if __name__ == "__main__":
+    # Instalação/deploy: baixa os arquivos BPE para TIKTOKEN_CACHE_DIR (fora das requisições)
+    import tiktoken
+
+    for nome in BPE_URLS:
+        tiktoken.get_encoding(nome)
+    print(f"Tokenizers em {TIKTOKEN_CACHE_DIR}: {', '.join(BPE_URLS)}")
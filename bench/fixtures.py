@@ -0,0 +1,94 @@
+"""
+Dados sintéticos para os benchmarks: briefings e PDFs de catálogo.
+"""
+import random
+
+EQUIPAMENTOS = [
+    "Betoneira 400L", "Vibrador de Concreto", "Régua Vibratória", "Placa Vibratória",
+    "Rolo Compactador", "Sapo Compactador", "Martelete Rompedor", "Serra Mármore",
+    "Furadeira de Impacto", "Andaime Tubular", "Escora Metálica", "Gerador 5kVA",
+    "Compressor de Ar", "Lavadora de Alta Pressão", "Roçadeira", "Cortador de Piso",
+]
+
+
+def briefing_atendente(i: int, unique: bool = True) -> dict:
+    """Briefing do atendente geral; com unique=False todos são idênticos (cache quente)."""
+    sufixo = f" {i}" if unique else ""
+    return {
+        "template_type": "atendente_geral",
+        "nome_empresa": f"Empresa Benchmark{sufixo}",
+        "nome_atendente": "Ana",
+        "endereco": "Rua das Flores, 123 - das 7 as. 17",
+        "horario_funcionamento": "seg a sex das 8 as 18",
+        "mensagem_boas_vindas": "Gostaria de sugestões",
+        "menu_opcoes": ["Orçamento", "Falar com atendente", "Suporte"],
+        "possui_menu": True,
+        "produtos_catalogo": [{"nome": nome, "precos": "sob consulta"} for nome in EQUIPAMENTOS[:6]],
+        "regra_preco_texto": "Acredito que preços só no WhatsApp",
+        "texto_objecoes": "Preciso de sugestões",
+    }
+
+
+def briefing_locadora(i: int, itens_por_categoria: int = 20, unique: bool = True) -> dict:
+    sufixo = f" {i}" if unique else ""
+    return {
+        "template_type": "locadora_equipamentos",
+        "nome_empresa": f"Locadora Benchmark{sufixo}",
+        "nome_atendente": "Bruno",
+        "categorias_equipamentos": [
+            {"categoria": f"Categoria {c}", "itens": [f"{random.choice(EQUIPAMENTOS)} {c}-{n}" for n in range(itens_por_categoria)]}
+            for c in range(8)
+        ],
+    }
+
+
+def google_forms_payload(i: int, unique: bool = True) -> dict:
+    dados = briefing_atendente(i, unique)
+    dados.pop("template_type")
+    return dados
+
+
+def refine_payload(tamanho_secoes: int = 10) -> dict:
+    secoes = "\n\n".join(f"## {n}) Seção {n}\n" + "Regra de atendimento. " * 20 for n in range(1, tamanho_secoes + 1))
+    return {"prompt_atual": secoes, "instrucao": "adicione regra sobre horário de almoço"}
+
+
+def make_pdf(paginas: list[list[str]]) -> bytes:
+    """Gera um PDF mínimo (texto em Helvetica, uma linha por item) sem dependências externas."""
+    n = len(paginas)
+    font_id = 3 + 2 * n
+    objetos = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(n))}] /Count {n} >>",
+    ]
+    for i, linhas in enumerate(paginas):
+        objetos.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        )
+        texto = " ".join(f"({linha}) '" for linha in linhas)
+        conteudo = f"BT /F1 10 Tf 12 TL 40 760 Td {texto} ET"
+        objetos.append(f"<< /Length {len(conteudo)} >>\nstream\n{conteudo}\nendstream")
+    objetos.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    saida = "%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objetos):
+        offsets.append(len(saida.encode("latin-1")))
+        saida += f"{i + 1} 0 obj\n{obj}\nendobj\n"
+    xref = len(saida.encode("latin-1"))
+    saida += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n"
+    saida += "".join(f"{off:010d} 00000 n \n" for off in offsets)
+    saida += f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return saida.encode("latin-1")
+
+
+def catalog_pdf(paginas: int = 10, linhas_por_pagina: int = 50, i: int = 0, unique: bool = False) -> bytes:
+    """PDF de catálogo; com unique=True a primeira linha leva o índice (outro hash, sem cache)."""
+    linhas = [
+        [f"{EQUIPAMENTOS[(p * linhas_por_pagina + l) % len(EQUIPAMENTOS)]} - cod {p}-{l}" for l in range(linhas_por_pagina)]
+        for p in range(paginas)
+    ]
+    if unique and linhas and linhas[0]:
+        linhas[0][0] += f" - lote {i}"
+    return make_pdf(linhas)
@@ -0,0 +1,125 @@
+"""
+Perfil do tempo de import da aplicação (cold start no Vercel).
+
+Uso (a partir da raiz do repositório):
+    python bench/importtime.py
+    python bench/importtime.py --runs 10 --budget-ms 600
+    python bench/importtime.py --output bench/results/importtime.json
+
+Roda `python -X importtime -c "import main"` em processos novos, usa a
+mediana das execuções e falha (exit 1) se o import de main passar do
+orçamento ou se algum módulo que deveria ser carregado só sob demanda
+(SDK da OpenAI, httpx, pdfplumber, tiktoken) aparecer no startup.
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import median
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND = ROOT / "backend"
+
+# Orçamento do import de main (ms, mediana) e módulos proibidos no startup
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1200"))
+LAZY_MODULES = ("openai", "httpx", "pdfplumber", "pdfminer", "tiktoken")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecida"
+
+
+def profile_once() -> dict[str, tuple[int, int]]:
+    """{módulo: (self_us, cumulativo_us)} de um import de main em processo limpo."""
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND, capture_output=True, text=True, check=True,
+    )
+    modulos = {}
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, cumulativo, nome = linha[len("import time:"):].split("|")
+        modulos[nome.strip()] = (int(proprio), int(cumulativo))
+    return modulos
+
+
+def main(args) -> dict:
+    # Uma execução descartada para gerar os .pyc (o Vercel empacota os bytecodes)
+    profile_once()
+    execucoes = [profile_once() for _ in range(args.runs)]
+
+    totais = [e["main"][1] / 1000 for e in execucoes if "main" in e]
+    proprio = defaultdict(list)
+    for execucao in execucoes:
+        for nome, (self_us, _) in execucao.items():
+            proprio[nome].append(self_us / 1000)
+
+    locais = sorted(p.stem for p in BACKEND.glob("*.py"))
+    carregados = set().union(*execucoes)
+    proibidos = sorted(
+        nome for nome in carregados
+        if nome.split(".")[0] in LAZY_MODULES
+    )
+    top = sorted(((nome, median(v)) for nome, v in proprio.items()), key=lambda item: item[1], reverse=True)
+
+    total_ms = median(totais)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "budget_ms": args.budget_ms,
+        "main_import_ms": round(total_ms, 1),
+        "main_import_ms_min": round(min(totais), 1),
+        "main_import_ms_max": round(max(totais), 1),
+        "local_modules_ms": {
+            nome: round(median(
+                e[nome][1] / 1000 for e in execucoes if nome in e
+            ), 1)
+            for nome in locais if nome in carregados
+        },
+        "top_self_ms": [{"module": nome, "ms": round(ms, 1)} for nome, ms in top[:args.top]],
+        "lazy_modules_loaded": proibidos,
+        "ok": total_ms <= args.budget_ms and not proibidos,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Perfil de import (cold start) com orçamento")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="módulos mais lentos no relatório")
+    parser.add_argument("--output", default=None, help="arquivo JSON de saída")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    relatorio = main(args)
+
+    print(f"import main: {relatorio['main_import_ms']:.1f}ms (mediana de {args.runs}; "
+          f"orçamento {args.budget_ms:.0f}ms)")
+    for nome, ms in relatorio["local_modules_ms"].items():
+        print(f"  {nome:<20} {ms:>8.1f}ms")
+    print("Mais lentos (self):")
+    for item in relatorio["top_self_ms"]:
+        print(f"  {item['module']:<40} {item['ms']:>8.1f}ms")
+    if relatorio["lazy_modules_loaded"]:
+        print(f"ERRO: carregados no startup: {', '.join(relatorio['lazy_modules_loaded'])}")
+
+    saida = Path(args.output) if args.output else (
+        ROOT / "bench" / "results" / f"importtime-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{relatorio['git_revision']}.json"
+    )
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    print(f"\nResultados gravados em {saida}")
+    sys.exit(0 if relatorio["ok"] else 1)
@@ -0,0 +1,116 @@
+"""
+Substituto local da API de chat completions da OpenAI para benchmarks.
+
+É um app ASGI servido em processo via httpx.ASGITransport: o SDK oficial,
+o retry/circuit breaker e o single-flight do backend são exercitados
+de verdade, sem rede e sem custo.
+"""
+import json
+import time
+import random
+import asyncio
+from dataclasses import dataclass
+
+import httpx
+from openai import AsyncOpenAI
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.5          # segundos até a resposta (ou até o primeiro token)
+    jitter: float = 0.1           # variação aleatória somada à latência
+    token_delay: float = 0.005    # intervalo entre tokens no streaming
+    error_rate: float = 0.0       # fração de respostas com erro
+    error_status: int = 503       # status dos erros injetados (429 inclui Retry-After)
+
+
+CATALOGO_EXEMPLO = {
+    "categorias": [
+        {"categoria": "Concreto e Alvenaria", "itens": ["Betoneira 400L", "Vibrador de Concreto"]},
+        {"categoria": "Compactação", "itens": ["Placa Vibratória", "Sapo Compactador"]},
+    ]
+}
+
+
+def _reply_for(messages: list[dict]) -> str:
+    """Resposta plausível conforme o prompt de sistema usado pelo backend."""
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+
+    if "catálogos de locação" in system:
+        return json.dumps(CATALOGO_EXEMPLO, ensure_ascii=False)
+    if "Senior Prompt Engineer" in system:
+        # Devolve o próprio JSON enviado (entre ```json e ```)
+        inicio = user.find("```json")
+        fim = user.find("```", inicio + 7)
+        if inicio != -1 and fim != -1:
+            return user[inicio:fim + 3]
+        return "{}"
+    # Refinamento: devolve o prompt atual
+    return user.split("PROMPT ATUAL:\n", 1)[-1].split("\n\n---", 1)[0]
+
+
+class MockOpenAI:
+    """App ASGI que implementa POST /v1/chat/completions (com e sem stream)."""
+
+    def __init__(self, config: MockConfig = None):
+        self.config = config or MockConfig()
+        self.requests = 0
+        self.errors = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        self.requests += 1
+        cfg = self.config
+        await asyncio.sleep(max(0.0, cfg.latency + random.uniform(-cfg.jitter, cfg.jitter)))
+
+        if random.random() < cfg.error_rate:
+            self.errors += 1
+            headers = [(b"content-type", b"application/json")]
+            if cfg.error_status == 429:
+                headers.append((b"retry-after", b"0"))
+            await send({"type": "http.response.start", "status": cfg.error_status, "headers": headers})
+            await send({"type": "http.response.body", "body": b'{"error": {"message": "erro injetado"}}'})
+            return
+
+        payload = json.loads(body or b"{}")
+        texto = _reply_for(payload.get("messages", []))
+        prompt_tokens = sum(len(m.get("content", "")) for m in payload.get("messages", [])) // 4
+        completion_tokens = len(texto) // 4
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": payload.get("model", "mock")}
+
+        if payload.get("stream"):
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/event-stream")]})
+            for i in range(0, len(texto), 16):
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": texto[i:i + 16]}, "finish_reason": None}]}
+                await send({"type": "http.response.body", "body": f"data: {json.dumps(chunk)}\n\n".encode(), "more_body": True})
+                await asyncio.sleep(cfg.token_delay)
+            await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+            return
+
+        resposta = {
+            **base,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": texto}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": json.dumps(resposta).encode()})
+
+
+def create_mock_client(mock: MockOpenAI) -> AsyncOpenAI:
+    """AsyncOpenAI apontando para o mock, sem retries do SDK (como em produção)."""
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=mock), base_url="http://mock-openai")
+    return AsyncOpenAI(api_key="mock", base_url="http://mock-openai/v1", http_client=http_client, max_retries=0)
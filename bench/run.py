@@ -0,0 +1,186 @@
+"""
+Benchmark dos endpoints com a OpenAI simulada.
+
+Uso (a partir da raiz do repositório):
+    python bench/run.py
+    python bench/run.py --endpoints generate refine --concurrency 1 8 32 --requests 200 --latency 0.3
+    python bench/run.py --error-rate 0.1 --error-status 429 --output bench/results/erros.json
+
+Os resultados (p50/p95/p99, req/s, erros por endpoint e concorrência) são
+gravados em JSON para comparação entre versões.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+# O benchmark dispara tudo do mesmo "cliente": sem rate limit, salvo se pedido explicitamente
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+
+import httpx
+
+import fixtures
+from mock_openai import MockConfig, MockOpenAI, create_mock_client
+
+
+def percentile(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    f = int(k)
+    c = min(f + 1, len(ordenados) - 1)
+    return ordenados[f] + (ordenados[c] - ordenados[f]) * (k - f)
+
+
+def build_request(endpoint: str, i: int, args) -> dict:
+    """Argumentos de httpx.request para a i-ésima requisição do endpoint."""
+    unique = not args.repeat
+    if endpoint == "generate":
+        return {"method": "POST", "url": "/generate", "json": fixtures.briefing_atendente(i, unique)}
+    if endpoint == "generate_locadora":
+        return {"method": "POST", "url": "/generate", "json": fixtures.briefing_locadora(i, unique=unique)}
+    if endpoint == "webhook":
+        return {"method": "POST", "url": "/webhook/google-forms", "json": fixtures.google_forms_payload(i, unique)}
+    if endpoint == "refine":
+        payload = fixtures.refine_payload()
+        if unique:
+            payload["instrucao"] += f" ({i})"
+        return {"method": "POST", "url": "/refine", "json": payload}
+    if endpoint == "upload_pdf":
+        # --repeat reenvia o mesmo PDF (cache do upload); senão cada requisição muda uma linha
+        pdf = fixtures.catalog_pdf(args.pdf_pages, i=i, unique=True) if unique else args.pdf_bytes
+        return {"method": "POST", "url": "/upload-pdf",
+                "files": {"file": ("catalogo.pdf", pdf, "application/pdf")}}
+    raise ValueError(f"Endpoint desconhecido: {endpoint}")
+
+
+async def run_scenario(client: httpx.AsyncClient, endpoint: str, concurrency: int, args) -> dict:
+    latencias: list[float] = []
+    status: dict[str, int] = {}
+    # Índices continuam entre cenários para que payloads "únicos" não acertem o cache
+    fila = iter(range(args.next_index, args.next_index + args.requests))
+    args.next_index += args.requests
+
+    async def worker():
+        for i in fila:
+            # Montar o payload (ex.: gerar o PDF) fica fora da latência medida
+            requisicao = build_request(endpoint, i, args)
+            inicio = time.perf_counter()
+            try:
+                resposta = await client.request(**requisicao)
+                chave = str(resposta.status_code)
+            except Exception as e:
+                chave = type(e).__name__
+            latencias.append(time.perf_counter() - inicio)
+            status[chave] = status.get(chave, 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencias),
+        "duration_s": round(duracao, 4),
+        "rps": round(len(latencias) / duracao, 2) if duracao else 0.0,
+        "p50_ms": round(percentile(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencias, 99) * 1000, 2),
+        "max_ms": round(max(latencias, default=0) * 1000, 2),
+        "status": status,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecida"
+
+
+async def main(args) -> dict:
+    mock = MockOpenAI(MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    ))
+
+    import main as app_main
+    import ai_service
+
+    ai_service._client = create_mock_client(mock)
+    args.pdf_bytes = fixtures.catalog_pdf(args.pdf_pages)
+    args.next_index = 0
+
+    resultados = []
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.lifespan(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    resultado = await run_scenario(client, endpoint, concurrency, args)
+                    resultados.append(resultado)
+                    print(
+                        f"{endpoint:<18} c={concurrency:<4} {resultado['rps']:>8.1f} req/s  "
+                        f"p50={resultado['p50_ms']:.1f}ms p95={resultado['p95_ms']:.1f}ms "
+                        f"p99={resultado['p99_ms']:.1f}ms  {resultado['status']}"
+                    )
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "requests": args.requests,
+            "latency_s": args.latency,
+            "jitter_s": args.jitter,
+            "error_rate": args.error_rate,
+            "error_status": args.error_status,
+            "repeat": args.repeat,
+            "pdf_pages": args.pdf_pages,
+        },
+        "mock": {"requests": mock.requests, "errors": mock.errors},
+        "results": resultados,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos endpoints com OpenAI simulada")
+    parser.add_argument("--endpoints", nargs="+",
+                        default=["generate", "generate_locadora", "webhook", "refine", "upload_pdf"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requisições por cenário")
+    parser.add_argument("--latency", type=float, default=0.5, help="latência simulada da OpenAI (s)")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--repeat", action="store_true", help="payloads idênticos (mede caches)")
+    parser.add_argument("--pdf-pages", type=int, default=10)
+    parser.add_argument("--output", default=None, help="arquivo JSON de saída")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    relatorio = asyncio.run(main(args))
+
+    saida = Path(args.output) if args.output else (
+        ROOT / "bench" / "results" / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{relatorio['git_revision']}.json"
+    )
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    print(f"\nResultados gravados em {saida}")
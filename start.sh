@@ -26,9 +26,22 @@ if [ ! -f "backend/.env" ]; then
     echo ""
 fi
 
+cd backend
+
+# Arquivos BPE do tiktoken (contagem exata de tokens); sem rede, a contagem é estimada
+if [ ! -d ".tiktoken_cache" ]; then
+    python token_budget.py || echo "Aviso: tokenizers não baixados, usando estimativa por caracteres"
+fi
+
+# ./start.sh prod -> gunicorn com workers uvicorn (um por núcleo), ver backend/gunicorn.conf.py
+if [ "$1" = "prod" ]; then
+    echo "Modo produção: http://0.0.0.0:${PORT:-8000}"
+    echo ""
+    exec gunicorn -c gunicorn.conf.py main:app
+fi
+
 echo "Acesse: http://localhost:8000"
 echo "Ctrl+C para parar"
 echo ""
 
-cd backend
 uvicorn main:app --reload --port 8000